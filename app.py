@@ -1,13 +1,24 @@
-from flask import Flask, send_file
+from flask import Flask, Response, make_response, request
 from flask_restful import Api
 
-from resources.spacy_resources import Data, AllData
-from data_visualization import visualize
+from db import db
+from resources.spacy_resources import Data, DataBatch, AllData
+from resources.frequency_resources import TopTerms, FavoriteTerm, TermTexts
+from resources.search_resources import Search
+from resources.similarity_resources import Duplicates
+from resources.job_resources import JobSubmit, Job
+from nlp import model
+from utils.csv_writer import results_directory
+from utils import metrics
+from utils.job_queue import JobWorkers
 
 # Init app
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///data.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config.setdefault('JOB_WORKERS', 2)
+db.init_app(app)
+metrics.init_app(app)
 # Init Api
 api = Api(app)
 
@@ -15,28 +26,89 @@ api = Api(app)
 @app.before_first_request  # It is required to create a table first because db does not create one for us
 def create_tables():
     db.create_all()
+    job_workers.start()  # analysis jobs are taken from the queue in the background
+
+
+job_workers = JobWorkers(app, app.config['JOB_WORKERS'])
+
+# Bounds of the /plot size options, so one request cannot ask for a figure of gigapixels
+PLOT_SIZE_LIMITS = {'width': (1, 40), 'height': (1, 40), 'dpi': (10, 300)}  # inches, inches, dots per inch
+
+
+@app.after_request  # Between requests, a model that outgrew MAX_STRINGS/MAX_RSS_MB is swapped for a fresh one
+def check_model_memory(response):
+    model.check_memory()
+    return response
 
 
 @app.route('/plot/<string:csv_filename>')  # For plotting the data
-def plotting(csv_filename):
+@app.route('/plot/<int:text_id>/<string:csv_filename>')  # For plotting the data of one text
+def plotting(csv_filename, text_id=None):
+    from data_visualization import render_plot  # pandas, matplotlib and seaborn load on the first plot only
+
+    size = {}
+    for name, (low, high) in PLOT_SIZE_LIMITS.items():
+        value = request.args.get(name)
+        if value is None:
+            size[name] = None
+            continue
+        try:
+            size[name] = float(value)
+        except ValueError:
+            size[name] = float('nan')
+        if not low <= size[name] <= high:  # also false for nan
+            return {'message': f'{name} must be a number between {low} and {high}'}, 400
+
     try:
-        bytes_obj = visualize(csv_filename)
+        directory = 'Results' if text_id is None else results_directory(text_id)
+        plot = render_plot(csv_filename, directory, **size)
 
-        return send_file(bytes_obj,
-                         attachment_filename='plot.png',
-                         mimetype='image/png')
+        # Cached plots come back with their ETag/Last-Modified so repeat hits can be answered with a 304
+        response = make_response(plot.png)
+        response.mimetype = 'image/png'
+        response.set_etag(plot.etag)
+        response.last_modified = plot.last_modified
+        return response.make_conditional(request)
     except Exception:
         return {'message': f'{csv_filename} is empty'}
 
 
+@app.route('/ready')  # For load balancers: ready once the model is loaded and warmed up
+def ready():
+    if model.is_ready():
+        return {'ready': True}
+    return {'ready': False}, 503
+
+
+@app.route('/metrics')  # Prometheus scrape target
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 api.add_resource(Data, '/data/<string:text_id>')
+api.add_resource(DataBatch, '/data/batch')
 api.add_resource(AllData, '/alldata')
+api.add_resource(TopTerms, '/top/<string:category>')
+api.add_resource(FavoriteTerm, '/favorite/<string:category>')
+api.add_resource(JobSubmit, '/jobs')
+api.add_resource(Job, '/jobs/<int:job_id>')
+api.add_resource(Search, '/search')
+api.add_resource(TermTexts, '/texts')
+api.add_resource(Duplicates, '/duplicates')
 # /data refers to root class that is Data and /data/<string:text_id> refers to the text we send from postman
 
 
+def warm_up(preload=False):
+    """Called by the server entry points only, so importing the app (ingest.py, the benchmarks) loads no model.
+    With preload the model is warmed up right away, before a preforking server (see gunicorn.conf.py) forks
+    its workers; otherwise in the background, and /ready answers 503 until it is done."""
+    if preload:
+        model.preload()
+    else:
+        model.warm_up_in_background()
+
+
 # Run the server
 if __name__ == '__main__':
-    from db import db
-    db.init_app(app)
-
+    warm_up()
     app.run(debug=True)
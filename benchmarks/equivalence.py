@@ -0,0 +1,224 @@
+"""Checks that the doc.to_array versions of the operations return what the earlier loops did.
+
+    python -m benchmarks.equivalence
+    python -m benchmarks.equivalence --sentences 500 --paragraphs 20 --seed 3
+
+The loops below are the implementations the operations had before nlp/token_array.py, run over the
+same Doc as the current operations. sentences_with_two_or_more_verbs is left out: its earlier version
+ran the Matcher before adding the pattern and so never matched anything.
+
+The results of analysis.analyse_paragraphs, which parses the text paragraph by paragraph and merges
+the partial results, are compared with the operations run once over the same paragraphs joined into
+one Doc. They are compared a second time with paragraphs cut into pieces of --max-chars characters,
+which checks that a cut paragraph is still counted as one. Every difference is printed and the run
+exits with status 1.
+"""
+import argparse
+import sys
+from collections import Counter
+
+import numpy
+
+from benchmarks.synthetic import generate_text
+
+
+def legacy_words_without_stopwords(doc):
+    return {'text_without_stopwords': [str(token) for token in doc
+                                       if token.is_stop is False if token.is_punct is False
+                                       if token.is_space is False]}
+
+
+def legacy_pos_words(doc, pos, prefix):
+    words = [token.text for token in doc if token.pos_ == pos]
+    frequency = Counter(words)
+    return {prefix + 's': words,
+            prefix + '_count': len(words),
+            prefix + '_frequency': frequency,
+            'favorite_' + prefix: max(frequency, key=frequency.get)}
+
+
+def legacy_total_adjectives(doc):
+    adjectives = [token.text for token in doc if token.pos_ == 'ADJ']
+    adj_frequency = Counter(adjectives)
+    favorite_adjective = max(adj_frequency, key=adj_frequency.get)
+    top_ten_adjectives = sorted(adj_frequency.items(), reverse=True, key=lambda x: x[1])[:10]
+
+    sentences_with_adj = []
+    for sent in doc.sents:
+        for token in sent:
+            if token.pos_ == "ADJ":
+                sentences_with_adj.append(sent)
+                break
+    sentences_and_adj_count = Counter(sentences_with_adj)
+    count = 0
+    sum = 0
+    for key in sentences_and_adj_count:
+        count += 1
+        sum += sentences_and_adj_count[key]
+    avg_in_sentences = sum / count
+
+    start = 0
+    paragraph_list, paragraphs_with_adjectives = [], []
+    for token in doc:
+        if token.is_space and token.text.count("\n") > 1:
+            paragraph_list.append(doc[start:token.i])
+            start = token.i
+    for para in paragraph_list:
+        for token in para:
+            if token.pos_ == "ADJ":
+                paragraphs_with_adjectives.append(para)
+    paragraphs_and_adj_count = Counter(paragraphs_with_adjectives)
+    for key in paragraphs_and_adj_count:
+        count += 1
+        sum = paragraphs_and_adj_count[key]
+    avg_in_paragraphs = sum / count
+
+    return {'adjectives': adjectives,
+            'adj_count': len(adjectives),
+            'adj_frequency': adj_frequency,
+            'favorite_adjective': favorite_adjective,
+            'top_ten_adjectives': top_ten_adjectives,
+            'average_adj_in_sentences': avg_in_sentences,
+            'average_adj_in_paragraphs': avg_in_paragraphs}
+
+
+def legacy_sentences_with_pos(doc, pos):
+    sentences = []
+    for sentence in list(doc.sents):
+        for token in sentence:
+            if token.pos_ == pos:
+                sentences.append(sentence)
+                break
+    return str(sentences)
+
+
+def legacy_matched_sentences(doc, name, pattern):
+    from spacy.matcher import Matcher
+
+    matcher = Matcher(doc.vocab)
+    matched_sentences = []
+
+    def collect_sents(matcher, doc, i, matches):
+        match_id, start, end = matches[i]
+        matched_sentences.append(doc[start:end].sent.text)
+
+    matcher.add(name, collect_sents, pattern)
+    matcher(doc)
+    return matched_sentences
+
+
+def legacy_tense(doc):
+    sentences_with_verbs = []
+    for sent in doc.sents:
+        for token in sent:
+            if token.pos_ == "VERB":
+                sentences_with_verbs.append(sent)
+                break
+
+    def with_tags(tags):
+        found = []
+        for sent in sentences_with_verbs:
+            for token in sent:
+                if token.tag_ in tags:
+                    found.append(sent)
+                    break
+        return str(found)
+
+    return {'present_tense_sentences': with_tags(["VBZ", "VBP", "VBG"]),
+            'past_tense_sentences': with_tags(["VBD", "VBN"]),
+            'future_tense_sentences': with_tags(["VBC", "VBF"])}
+
+
+LEGACY = {
+    'words_without_stopwords': legacy_words_without_stopwords,
+    'total_nouns': lambda doc: legacy_pos_words(doc, 'NOUN', 'noun'),
+    'total_verbs': lambda doc: legacy_pos_words(doc, 'VERB', 'verb'),
+    'total_adjectives': legacy_total_adjectives,
+    'sentences_with_two_or_more_nouns': lambda doc: {'sentences_with_two_or_more_nouns': legacy_matched_sentences(
+        doc, 'SENTENCES_WITH_2_OR_MORE_NOUNS', [{'POS': 'NOUN'}, {'POS': 'NOUN'}, {'POS': 'NOUN', 'OP': '*'}])},
+    'sentences_with_two_or_more_adj': lambda doc: {'sentences_with_two_or_more_adj': legacy_matched_sentences(
+        doc, 'SENTENCES_WITH_2_OR_MORE_ADJ', [{'POS': 'ADJ'}, {'POS': 'ADJ'}, {'POS': 'ADJ', 'OP': '*'}])},
+    'sentences_without_noun': lambda doc: {'sentences_without_nouns': legacy_sentences_with_pos(doc, 'NOUN')},
+    'sentences_without_adj': lambda doc: {'sentences_without_adj': legacy_sentences_with_pos(doc, 'ADJ')},
+    'sentences_without_verbs': lambda doc: {'sentences_without_verbs': legacy_sentences_with_pos(doc, 'VERB')},
+    'tense': legacy_tense,
+}
+
+
+def differences(text):
+    """(operation, key, legacy value, current value) for every result that differs on the text"""
+    from nlp import operations
+
+    doc = operations.parse(text)
+    found = []
+    for name, legacy in LEGACY.items():
+        doc.user_data.clear()  # no token array or matches left over from the operation before
+        current = getattr(operations, name)(doc)
+        expected = legacy(doc)
+        for key in sorted(set(expected) | set(current)):
+            if expected.get(key) != current.get(key):
+                found.append((name, key, expected.get(key), current.get(key)))
+    return found
+
+
+# Matcher patterns can match across the cut between two pieces of a paragraph, which the pieces parsed
+# on their own never see
+MATCHED_ACROSS_CUTS = {'noun_adj_phrases', 'adj_noun_phrases', 'sentences_with_one_or_more_nouns',
+                       'sentences_with_one_or_more_adj', 'sentences_with_one_or_more_verbs'}
+
+
+def joined_doc(docs):
+    """One Doc with the tokens and annotations of the docs, as if the parser had seen them together"""
+    from spacy.attrs import DEP, ENT_IOB, ENT_TYPE, HEAD, POS, TAG
+    from spacy.tokens import Doc
+
+    attrs = [TAG, POS, HEAD, DEP, ENT_IOB, ENT_TYPE]  # HEAD is relative, so the arrays join as they are
+    doc = Doc(docs[0].vocab, words=[token.text for piece in docs for token in piece],
+              spaces=[bool(token.whitespace_) for piece in docs for token in piece])
+    doc.from_array(attrs, numpy.concatenate([piece.to_array(attrs) for piece in docs]))
+    return doc
+
+
+def paragraph_differences(text, max_chars=None):
+    """(analysis, key, whole-Doc value, paragraph value) for every result of analyse_paragraphs that differs
+    from the same analysis of one Doc joined from the parsed pieces"""
+    from nlp import analysis, operations
+    from nlp.chunks import CHUNK_CHARS, paragraph_chunks
+
+    max_chars = max_chars or CHUNK_CHARS
+    analyses = [name for name in analysis.ANALYSES if max_chars == CHUNK_CHARS or name not in MATCHED_ACROSS_CUTS]
+    current, _ = analysis.analyse_paragraphs(text, analyses, max_chars=max_chars)
+    pieces = list(paragraph_chunks(text, max_chars))
+    doc = joined_doc(list(operations.pipe(pieces, analysis.components_for(analyses))))
+
+    found = []
+    for name in analyses:
+        expected = analysis.ANALYSES[name](doc)
+        for key in sorted(set(expected) | set(current[name])):
+            if expected.get(key) != current[name].get(key):
+                found.append((name, key, expected.get(key), current[name].get(key)))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the operations with their earlier loop implementations')
+    parser.add_argument('--sentences', type=int, default=200)
+    parser.add_argument('--paragraphs', type=int, default=10)
+    parser.add_argument('--vocabulary', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-chars', type=int, default=200, help='length of the pieces of the second paragraph run')
+    args = parser.parse_args(argv)
+
+    text = generate_text(args.sentences, args.paragraphs, args.vocabulary, args.seed)
+    runs = [('operations', differences(text)),
+            ('paragraphs', paragraph_differences(text)),
+            ('pieces of {} characters'.format(args.max_chars), paragraph_differences(text, args.max_chars))]
+    for run, found in runs:
+        for name, key, expected, current in found:
+            print('MISMATCH {} {}.{}: {!r} != {!r}'.format(run, name, key, expected, current), file=sys.stderr)
+        print('{}: {} differences'.format(run, len(found)))
+    return 1 if any(found for _, found in runs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
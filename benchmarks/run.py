@@ -0,0 +1,200 @@
+"""Benchmarks for the operations, end-to-end requests and persistence.
+
+    python -m benchmarks.run --output baseline.json
+    python -m benchmarks.run --compare baseline.json --threshold 0.15
+
+Every benchmark runs on the same synthetic text (see benchmarks/synthetic.py) and against a
+throwaway SQLite database and Results folder, so runs are reproducible and never touch data.db.
+The JSON output holds the timing statistics of every benchmark in seconds; with --compare the
+run exits with status 1 when a median got slower than the baseline by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_text
+
+
+def measure(function, repeat, warmup=1):
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {'repeat': repeat,
+            'min': timings[0],
+            'median': statistics.median(timings),
+            'mean': statistics.mean(timings),
+            'p95': timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]}
+
+
+def bench_operations(text, repeat):
+    from nlp import analysis, operations
+
+    benchmarks = {'parse': measure(lambda: operations.parse(text), repeat)}
+    doc = operations.parse(text)
+    for name, operation in analysis.ANALYSES.items():
+        def run(operation=operation):
+            doc.user_data.clear()  # the shared token array and matches would otherwise make repeats free
+            operation(doc)
+        benchmarks['operations.' + operation.__name__] = measure(run, repeat)
+    benchmarks['analysis.analyse_paragraphs'] = measure(lambda: analysis.analyse_paragraphs(text), repeat)
+    return benchmarks
+
+
+def bench_requests(app, text, repeat):
+    from db import db
+    from utils.csv_writer import background_writer
+
+    client = app.test_client()
+    client.post('/data/1', json={'text_description': text})
+
+    def cold():
+        with app.app_context():
+            for table in ('analysis_results', 'paragraph_partials'):
+                db.session.execute(db.text('DELETE FROM ' + table))
+            db.session.commit()
+        client.get('/data/1')
+
+    # Every PUT swaps the last paragraph, so only that paragraph is parsed again
+    edits = iter(range(10 ** 9))
+
+    def put_edit():
+        client.put('/data/1', json={'text_description': text + '\n\nedit number {} of this text.'.format(next(edits))})
+
+    benchmarks = {'request.get_data.cold': measure(cold, repeat),
+                  'request.get_data.stored_results': measure(lambda: client.get('/data/1'), repeat),
+                  'request.put_data.one_paragraph_edited': measure(put_edit, repeat)}
+    background_writer.flush()
+    return benchmarks
+
+
+def bench_persistence(app, text, repeat):
+    from models.results import Results
+    from nlp import analysis
+
+    with app.app_context():
+        results, _ = analysis.analyse_paragraphs(text)
+        counter = iter(range(10 ** 9))
+        return {'results.save_all.insert': measure(lambda: Results.save_all(next(counter) + 1000, 'bench', results),
+                                                   repeat),
+                'results.save_all.upsert': measure(lambda: Results.save_all(1, 'bench', results), repeat)}
+
+
+def bench_csv(text, directory, repeat):
+    from nlp import analysis, csv_export
+
+    results, _ = analysis.analyse_paragraphs(text)
+    writes = csv_export.csv_writes(results)
+
+    def write_all():
+        for function, *args in writes:
+            function(*args, directory=directory)
+
+    return {'csv.write_all': measure(write_all, repeat)}
+
+
+def bench_plot(directory, repeat):
+    import data_visualization
+
+    def cold():
+        data_visualization._cache.clear()
+        data_visualization.visualize('noun_frequency.csv', directory)
+
+    return {'plot.visualize.cold': measure(cold, repeat),
+            'plot.visualize.cached': measure(lambda: data_visualization.visualize('noun_frequency.csv', directory),
+                                             repeat)}
+
+
+def compare(current, baseline, threshold):
+    """Benchmarks whose median got slower than the baseline by more than the threshold"""
+    regressions = []
+    for name, stats in current['benchmarks'].items():
+        before = baseline.get('benchmarks', {}).get(name)
+        if before and before['median'] > 0:
+            change = stats['median'] / before['median'] - 1
+            if change > threshold:
+                regressions.append({'benchmark': name, 'baseline': before['median'],
+                                    'current': stats['median'], 'change': change})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the SpacyApi hot paths')
+    parser.add_argument('--sentences', type=int, default=200)
+    parser.add_argument('--paragraphs', type=int, default=10)
+    parser.add_argument('--vocabulary', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--only', action='append', choices=['operations', 'requests', 'persistence', 'csv', 'plot'],
+                        help='run only these groups (default: all)')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    parser.add_argument('--compare', help='baseline JSON report to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown of a median, 0.10 = 10%%')
+    args = parser.parse_args(argv)
+    groups = args.only or ['operations', 'requests', 'persistence', 'csv', 'plot']
+
+    text = generate_text(args.sentences, args.paragraphs, args.vocabulary, args.seed)
+    workdir = tempfile.mkdtemp(prefix='spacyapi-bench-')
+    from app import app
+    from db import db
+    from nlp import model
+    import utils.csv_writer
+
+    model.warm_up()  # the model is loaded before anything is timed
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    app.config['TESTING'] = True
+    utils.csv_writer.RESULTS_DIR = os.path.join(workdir, 'Results')
+    with app.app_context():
+        db.create_all()
+
+    benchmarks = {}
+    csv_directory = os.path.join(workdir, 'csv')
+    if 'operations' in groups:
+        benchmarks.update(bench_operations(text, args.repeat))
+    if 'requests' in groups:
+        benchmarks.update(bench_requests(app, text, args.repeat))
+    if 'persistence' in groups:
+        benchmarks.update(bench_persistence(app, text, args.repeat))
+    if 'csv' in groups or 'plot' in groups:
+        benchmarks.update(bench_csv(text, csv_directory, args.repeat))
+    if 'plot' in groups:
+        benchmarks.update(bench_plot(csv_directory, args.repeat))
+
+    import spacy
+    from nlp.model import model_id
+    report = {'meta': {'python': platform.python_version(), 'spacy': spacy.__version__, 'model': model_id(),
+                       'sentences': args.sentences, 'paragraphs': args.paragraphs, 'vocabulary': args.vocabulary,
+                       'seed': args.seed, 'characters': len(text)},
+              'benchmarks': benchmarks}
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            report['regressions'] = compare(report, json.load(baseline_file), args.threshold)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+    if report.get('regressions'):
+        for regression in report['regressions']:
+            print('REGRESSION {benchmark}: {baseline:.6f}s -> {current:.6f}s (+{change:.0%})'.format(**regression),
+                  file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import random
+
+ADJECTIVE_STEMS = ["bright", "quiet", "heavy", "careful", "simple", "ancient", "rapid", "gentle", "narrow", "bold"]
+NOUN_STEMS = ["river", "engine", "garden", "letter", "market", "window", "teacher", "signal", "forest", "contract"]
+VERBS_PRESENT = ["builds", "finds", "carries", "opens", "watches", "moves", "writes", "follows"]
+VERBS_PAST = ["built", "found", "carried", "opened", "watched", "moved", "wrote", "followed"]
+NAMES = ["John Smith", "Mary Jones", "Alice Brown", "David Miller", "Sarah Wilson"]
+
+TEMPLATES = [
+    "The {adj} {noun} {verb_present} the {adj} {noun}.",
+    "{name} {verb_past} a {adj} {noun} near the {noun} {noun}.",
+    "Every {noun} {verb_present} {adj} and {adj} {noun} every day.",
+    "Yesterday the {noun} {verb_past} quietly.",
+    "It is {adj}.",
+]
+
+
+def vocabulary(size):
+    """`size` nouns and adjectives, derived from the stems so the tagger still recognises most of them"""
+    nouns = [NOUN_STEMS[i % len(NOUN_STEMS)] + ("" if i < len(NOUN_STEMS) else str(i)) for i in range(size)]
+    adjectives = [ADJECTIVE_STEMS[i % len(ADJECTIVE_STEMS)] + ("" if i < len(ADJECTIVE_STEMS) else str(i))
+                  for i in range(size)]
+    return nouns, adjectives
+
+
+def generate_text(sentences=20, paragraphs=4, vocabulary_size=10, seed=0):
+    """Synthetic text with nouns, adjectives, verbs in two tenses and person names, split into
+    paragraphs by blank lines the way the analyses expect"""
+    rng = random.Random(seed)
+    nouns, adjectives = vocabulary(vocabulary_size)
+    paragraphs = max(1, min(paragraphs, sentences))
+    per_paragraph = [sentences // paragraphs + (1 if i < sentences % paragraphs else 0) for i in range(paragraphs)]
+
+    text = []
+    for count in per_paragraph:
+        paragraph = []
+        for _ in range(count):
+            template = rng.choice(TEMPLATES)
+            sentence = template
+            while "{" in sentence:
+                sentence = sentence.replace("{adj}", rng.choice(adjectives), 1) \
+                    .replace("{noun}", rng.choice(nouns), 1) \
+                    .replace("{verb_present}", rng.choice(VERBS_PRESENT), 1) \
+                    .replace("{verb_past}", rng.choice(VERBS_PAST), 1) \
+                    .replace("{name}", rng.choice(NAMES), 1)
+            paragraph.append(sentence)
+        text.append(" ".join(paragraph))
+    return "\n\n".join(text)
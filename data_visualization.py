@@ -1,24 +1,70 @@
+import matplotlib
+matplotlib.use("Agg")  # non-interactive backend, nothing is ever shown on a screen
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
 import pandas as pd
-import matplotlib.pyplot as plt
 import seaborn as sns
-import io
+from matplotlib.figure import Figure
 
 sns.set(style="darkgrid")
 
+CACHE_SIZE = 64  # rendered plots kept in memory
+
+PlotImage = namedtuple("PlotImage", ["png", "etag", "last_modified"])
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_render_lock = threading.Lock()  # seaborn and matplotlib share global state between threads
+
 
-def visualize(name):
-    path = "Results" + "/" + name
+def _render(path, width=None, height=None, dpi=None):
     df = pd.read_csv(path)
     col_1 = df.columns[1]  # for frequency
     col_2 = df.columns[0]  # for name of anything like noun, adj
 
-    sns.barplot(x=col_1, y=col_2, data=df)
-    plt.title(f'{col_2} {col_1}')
-    plt.tight_layout()
-    # plt.show()
+    # A fresh figure per render, so nothing piles up on the global pyplot figure
+    figsize = None if width is None or height is None else (width, height)
+    figure = Figure(figsize=figsize, dpi=dpi)
+    ax = figure.subplots()
+    sns.barplot(x=col_1, y=col_2, data=df, ax=ax)
+    ax.set_title(f'{col_2} {col_1}')
+    figure.tight_layout()
+
+    bytes_image = io.BytesIO()
+    figure.savefig(bytes_image, format='png')
+    return bytes_image.getvalue()
+
+
+def render_plot(name, directory="Results", width=None, height=None, dpi=None):
+    """PNG bar plot of a csv file, rendered again only when the file or the size options change"""
+    path = directory + "/" + name
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, width, height, dpi)
+    with _cache_lock:
+        plot = _cache.get(key)
+        if plot is not None:
+            _cache.move_to_end(key)
+            return plot
+
+    with _render_lock:
+        png = _render(path, width, height, dpi)
+    plot = PlotImage(png, hashlib.sha1(png).hexdigest(), datetime.fromtimestamp(stat.st_mtime, timezone.utc))
+
+    with _cache_lock:
+        _cache[key] = plot
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return plot
+
 
+def visualize(name, directory="Results"):
     # Saving figures into a bytes-object and exposing it whenever req through flask
-    bytes_image = io.BytesIO(b"f'{col_1}_{col_2}.csv'")
-    plt.savefig(bytes_image, format='png')
+    bytes_image = io.BytesIO(render_plot(name, directory).png)
     bytes_image.seek(0)
     return bytes_image
@@ -1,3 +1,32 @@
+import time
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from utils import metrics
 
 db = SQLAlchemy()
+
+# SQLite before 3.32 refuses statements with more than 999 bound parameters, long IN lists are split below that
+SQLITE_MAX_PARAMS = 900
+
+
+def chunked(values, size=SQLITE_MAX_PARAMS):
+    """The values as lists of at most size, one IN list per query"""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+# Every commit is timed for /metrics, whichever model or script issues it
+@event.listens_for(Session, 'before_commit')
+def start_commit_timer(session):
+    session.info['commit_started'] = time.perf_counter()
+
+
+@event.listens_for(Session, 'after_commit')
+def stop_commit_timer(session):
+    started = session.info.pop('commit_started', None)
+    if started is not None:
+        metrics.observe('spacyapi_db_commit_seconds', time.perf_counter() - started)
@@ -0,0 +1,25 @@
+# gunicorn -c gunicorn.conf.py app:app
+#
+# The app is imported once in the master and the spaCy model is loaded and warmed up there,
+# then forked, so the workers share the model's memory pages copy-on-write. With SPACY_PRELOAD=0
+# every worker imports the app itself and warms up its own model in the background.
+import os
+
+preload_app = os.environ.get('SPACY_PRELOAD', '1') == '1'
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+threads = int(os.environ.get('THREADS', '4'))
+
+
+def when_ready(server):
+    # runs in the master after the preloaded app is imported and before the first worker is forked
+    if server.cfg.preload_app:
+        from app import warm_up
+        warm_up(preload=True)
+
+
+def post_worker_init(worker):
+    # runs in every worker once it has imported the app
+    if not worker.cfg.preload_app:
+        from app import warm_up
+        warm_up()
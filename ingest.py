@@ -0,0 +1,153 @@
+"""Bulk loading of text corpora into spacy_db.
+
+    python ingest.py corpus.jsonl
+    python ingest.py corpus.csv --on-conflict replace --analyse --n-process 4
+    python ingest.py corpus.txt --start-id 1000
+
+jsonl and csv records carry `text_id` and `text_description`; a plain-text corpus holds
+one text per line and its text_ids are numbered from --start-id. The file is streamed and
+written in batched transactions, so memory stays bounded whatever the size of the corpus.
+"""
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+
+from sqlalchemy.dialects.sqlite import insert
+
+from app import app
+from db import chunked, db
+from models.frequency import TermFrequency
+from models.similarity import TextSignature
+from models.spacy_models import DataModel
+from nlp import analysis
+from resources.spacy_resources import store_results
+
+BATCH_SIZE = 5000
+
+
+def read_jsonl(corpus, args):
+    for line in corpus:
+        if line.strip():
+            record = json.loads(line)
+            yield int(record[args.id_field]), record[args.text_field], len(line.encode('utf-8'))
+
+
+def read_csv(corpus, args):
+    for record in csv.DictReader(corpus):
+        text_description = record[args.text_field]
+        yield int(record[args.id_field]), text_description, len(text_description.encode('utf-8'))
+
+
+def read_txt(corpus, args):
+    text_id = args.start_id
+    for line in corpus:
+        text_description = line.rstrip('\n')
+        if text_description.strip():
+            yield text_id, text_description, len(line.encode('utf-8'))
+            text_id += 1
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv, 'txt': read_txt}
+
+
+def batches(records, size):
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def existing_texts(text_ids):
+    """{text_id: text_description} of the text_ids already in spacy_db"""
+    existing = {}
+    for chunk in chunked(text_ids):
+        existing.update(DataModel.query.with_entities(DataModel.text_id, DataModel.text_description)
+                        .filter(DataModel.text_id.in_(chunk)))
+    return existing
+
+
+def insert_statement(on_conflict):
+    statement = insert(DataModel.__table__)
+    if on_conflict == 'replace':
+        return statement.on_conflict_do_update(
+            index_elements=['text_id'], set_={'text_description': statement.excluded.text_description})
+    return statement.on_conflict_do_nothing(index_elements=['text_id'])
+
+
+def ingest(records, batch_size=BATCH_SIZE, on_conflict='ignore', analyse=False, n_process=1, out=sys.stderr):
+    """Insert (text_id, text_description, size) records in one transaction per batch and report throughput"""
+    statement = insert_statement(on_conflict)
+    docs, size, started = 0, 0, time.time()
+    for batch in batches(records, batch_size):
+        stored = batch
+        if analyse and on_conflict == 'ignore':  # only the texts that actually get inserted are analysed
+            existing = existing_texts([text_id for text_id, _, _ in batch])
+            stored = [record for record in batch if record[0] not in existing]
+        elif not analyse and on_conflict == 'replace':
+            # The terms and signature of a replaced text describe its old version; without an analysis
+            # to overwrite them they are dropped, as the text's stored results are by their content hash
+            existing = existing_texts([text_id for text_id, _, _ in batch])
+            changed = [text_id for text_id, text_description, _ in batch
+                       if text_id in existing and existing[text_id] != text_description]
+            TermFrequency.remove_texts(changed, commit=False)
+            TextSignature.delete_by_text_ids(changed, commit=False)
+
+        db.session.execute(statement, [{'text_id': text_id, 'text_description': text_description}
+                                       for text_id, text_description, _ in batch])
+        failed = 0
+        if analyse:
+            texts = [text_description for _, text_description, _ in stored]
+            for (text_id, text_description, _), results in zip(stored, analysis.analyse_batch(texts, n_process=n_process)):
+                if not isinstance(results, Exception):
+                    try:
+                        with db.session.begin_nested():  # a savepoint, the rest of the batch is kept
+                            store_results(text_id, text_description, results)
+                        continue
+                    except Exception as e:
+                        results = e
+                failed += 1  # the text is stored all the same, it is analysed on its next GET
+                print('text_id {}: analysis failed: {}'.format(text_id, results), file=out)
+        db.session.commit()
+
+        docs += len(batch)
+        size += sum(record_size for _, _, record_size in batch)
+        elapsed = max(time.time() - started, 1e-9)
+        print('{} docs  {:.1f} docs/s  {:.2f} MB/s{}'.format(docs, docs / elapsed, size / elapsed / 1e6,
+                                                           '  {} not analysed'.format(failed) if failed else ''),
+              file=out)
+    return docs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stream a corpus into spacy_db in batched transactions')
+    parser.add_argument('corpus', help='path to a .jsonl, .csv or .txt corpus')
+    parser.add_argument('--format', choices=sorted(READERS), help='defaults to the file extension')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='texts per transaction')
+    parser.add_argument('--on-conflict', choices=['ignore', 'replace'], default='ignore',
+                        help='what to do with a text_id that already exists')
+    parser.add_argument('--analyse', action='store_true', help='also analyse the texts through nlp.pipe')
+    parser.add_argument('--n-process', type=int, default=1, help='processes for nlp.pipe with --analyse')
+    parser.add_argument('--id-field', default='text_id')
+    parser.add_argument('--text-field', default='text_description')
+    parser.add_argument('--start-id', type=int, default=1, help='first text_id of a plain-text corpus')
+    args = parser.parse_args(argv)
+
+    corpus_format = args.format or args.corpus.rsplit('.', 1)[-1]
+    if corpus_format not in READERS:
+        parser.error('unknown corpus format {}'.format(corpus_format))
+
+    with app.app_context(), open(args.corpus, newline='' if corpus_format == 'csv' else None,
+                                 encoding='utf-8') as corpus:
+        db.create_all()
+        docs = ingest(READERS[corpus_format](corpus, args), args.batch_size, args.on_conflict,
+                      args.analyse, args.n_process)
+    print('ingested {} texts'.format(docs), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+from collections import Counter
+
+from sqlalchemy import event, func, literal, union_all
+from sqlalchemy.dialects.sqlite import insert
+
+from db import chunked, db, SQLITE_MAX_PARAMS
+
+
+class TextTerm(db.Model):
+    """How often a term of a category (noun, verb, name, ...) occurs in one text. Read by term, it is an
+    inverted index: the posting list of a term is its rows in the (category, term, text_id) index."""
+    __tablename__ = 'text_terms'
+    __table_args__ = (db.Index('ix_text_terms_category_term_text_id', 'category', 'term', 'text_id'),)
+
+    text_id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    term = db.Column(db.String(200), primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+
+    @classmethod
+    def postings(cls, terms, match_all=False, after_id=None, limit=100):
+        """Texts containing any (or, with match_all, every) one of the (category, term) pairs, in text_id
+        order after after_id (from the first text when None), with the summed counts of those terms. Text ids
+        may be numbers or strings, SQLite orders the numbers first. The category may be a list, to match the
+        term in any of those categories. Only the posting lists of the terms are read, never the whole table:
+        the (category, term, text_id) index needs the category, so every lookup gives one."""
+        lists = []
+        for i, (category, term) in enumerate(terms):
+            categories = [category] if isinstance(category, str) else list(category)
+            posting = db.select([cls.text_id, cls.count, literal(i).label('term_index')]) \
+                .where(cls.category.in_(categories)).where(cls.term == term)
+            if after_id is not None:
+                posting = posting.where(cls.text_id > after_id)
+            lists.append(posting)
+        matches = union_all(*lists).alias('matches')
+        query = db.select([matches.c.text_id, func.sum(matches.c.count).label('count')]) \
+            .group_by(matches.c.text_id).order_by(matches.c.text_id).limit(limit)
+        if match_all:
+            query = query.having(func.count(func.distinct(matches.c.term_index)) == len(terms))
+        return [{'text_id': row.text_id, 'count': row.count} for row in db.session.execute(query)]
+
+
+@event.listens_for(db.metadata, 'after_create')
+def create_postings_index(target, connection, **kw):
+    """create_all() only makes the indexes of new tables; text_terms may predate its posting index"""
+    for index in TextTerm.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+class TermFrequency(db.Model):
+    """How often a term of a category occurs in the whole corpus, the sum of its TextTerm counts"""
+    __tablename__ = 'term_frequency'
+    __table_args__ = (db.Index('ix_term_frequency_category_count', 'category', 'count'),)
+
+    category = db.Column(db.String(50), primary_key=True)
+    term = db.Column(db.String(200), primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+
+    def json(self):
+        return {'term': self.term, 'count': self.count}
+
+    @classmethod
+    def top(cls, category, k=10):
+        return cls.query.filter_by(category=category).order_by(cls.count.desc(), cls.term).limit(k).all()
+
+    @classmethod
+    def _add(cls, deltas):
+        """Add {(category, term): delta} to the corpus counts and drop terms that no longer occur"""
+        deltas = [{'category': category, 'term': term, 'count': delta}
+                  for (category, term), delta in deltas.items() if delta]
+        if not deltas:
+            return
+        statement = insert(cls.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['category', 'term'], set_={'count': cls.__table__.c.count + statement.excluded.count})
+        db.session.execute(statement, deltas)
+        # Only a term whose count went down can have dropped to zero, and it is deleted by its primary
+        # key; filtering on count alone would scan the whole table on every analysis
+        lowered = [(row['category'], row['term']) for row in deltas if row['count'] < 0]
+        for chunk in chunked(lowered, SQLITE_MAX_PARAMS // 2):  # two bound parameters per term
+            cls.query.filter(db.tuple_(cls.category, cls.term).in_(chunk), cls.count <= 0) \
+                .delete(synchronize_session=False)
+
+    @classmethod
+    def update_text(cls, text_id, term_counts, commit=True):
+        """Replace the terms of a text for the categories in term_counts ({category: Counter}) and
+        move the corpus counts by the difference only, instead of recounting the corpus"""
+        if not term_counts:
+            if commit:
+                db.session.commit()
+            return
+        old_rows = TextTerm.query.filter(TextTerm.text_id == text_id,
+                                         TextTerm.category.in_(list(term_counts))).all()
+        deltas = Counter()
+        for row in old_rows:
+            deltas[row.category, row.term] -= row.count
+        for category, counts in term_counts.items():
+            for term, count in counts.items():
+                deltas[category, term] += count
+
+        TextTerm.query.filter(TextTerm.text_id == text_id, TextTerm.category.in_(list(term_counts))) \
+            .delete(synchronize_session=False)
+        rows = [{'text_id': text_id, 'category': category, 'term': term, 'count': count}
+                for category, counts in term_counts.items() for term, count in counts.items()]
+        if rows:
+            db.session.execute(TextTerm.__table__.insert(), rows)
+        cls._add(deltas)
+        if commit:
+            db.session.commit()
+
+    @classmethod
+    def remove_text(cls, text_id, commit=True):
+        """Take every term of a text out of the corpus counts"""
+        cls.remove_texts([text_id], commit)
+
+    @classmethod
+    def remove_texts(cls, text_ids, commit=True):
+        """Take every term of the texts out of the corpus counts, with one update of the counts"""
+        deltas = Counter()
+        for chunk in chunked(text_ids):
+            rows = TextTerm.query.filter(TextTerm.text_id.in_(chunk))
+            for row in rows:
+                deltas[row.category, row.term] -= row.count
+            rows.delete(synchronize_session=False)
+        cls._add(deltas)
+        if commit:
+            db.session.commit()
@@ -0,0 +1,124 @@
+import time
+
+from sqlalchemy import event
+
+from db import db
+from models.spacy_models import JsonEncodedDict
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+
+
+class JobModel(db.Model):
+    """An analysis job in the durable queue; workers claim pending jobs oldest first"""
+    __tablename__ = 'jobs'
+    __table_args__ = (db.Index('ix_jobs_status_id', 'status', 'id'),
+                      db.Index('ix_jobs_text_id_text_hash', 'text_id', 'text_hash'))
+
+    id = db.Column(db.Integer, primary_key=True)
+    text_id = db.Column(db.Integer, nullable=False)
+    text_hash = db.Column(db.String(64))
+    status = db.Column(db.String(20), nullable=False, default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    not_before = db.Column(db.Float, nullable=False, default=0, server_default='0')  # no claim before this time
+    result = db.Column(JsonEncodedDict)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False)
+
+    def __init__(self, text_id, text_hash):
+        self.text_id = text_id
+        self.text_hash = text_hash
+        self.status = PENDING
+        self.attempts = 0
+        self.not_before = 0
+        self.created_at = self.updated_at = time.time()
+
+    def json(self):
+        job = {'job_id': self.id, 'text_id': self.text_id, 'status': self.status, 'attempts': self.attempts}
+        if self.status == DONE:
+            job['result'] = self.result
+        elif self.status == FAILED:
+            job['error'] = self.error
+        return job
+
+    @classmethod
+    def find_by_id(cls, job_id):
+        return cls.query.get(job_id)
+
+    @classmethod
+    def find_active(cls, text_id, text_hash):
+        """A pending or running job for the same text, which a new submission can share"""
+        return cls.query.filter(cls.text_id == text_id, cls.text_hash == text_hash,
+                                cls.status.in_([PENDING, RUNNING])).first()
+
+    @classmethod
+    def queue_depth(cls):
+        return cls.query.filter_by(status=PENDING).count()
+
+    @classmethod
+    def claim(cls):
+        """Mark the oldest pending job that is due as running and return it; the conditional UPDATE
+        makes sure only one worker (thread or process) gets each job"""
+        while True:
+            job = cls.query.filter(cls.status == PENDING, cls.not_before <= time.time()).order_by(cls.id).first()
+            if job is None:
+                db.session.commit()
+                return None
+            claimed = cls.query.filter_by(id=job.id, status=PENDING).update(
+                {'status': RUNNING, 'attempts': cls.attempts + 1, 'updated_at': time.time()},
+                synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                db.session.refresh(job)
+                return job
+
+    @classmethod
+    def heartbeat(cls, job_ids):
+        """Mark running jobs as alive, so that requeue_stale leaves them alone however long they take"""
+        if job_ids:
+            cls.query.filter(cls.id.in_(list(job_ids)), cls.status == RUNNING).update(
+                {'updated_at': time.time()}, synchronize_session=False)
+        db.session.commit()
+
+    @classmethod
+    def requeue_stale(cls, timeout):
+        """Put jobs back in the queue whose worker went away while running them"""
+        cls.query.filter(cls.status == RUNNING, cls.updated_at < time.time() - timeout).update(
+            {'status': PENDING, 'updated_at': time.time()}, synchronize_session=False)
+        db.session.commit()
+
+    def finish(self, result):
+        self.status = DONE
+        self.result = result
+        self.error = None
+        self.updated_at = time.time()
+        db.session.commit()
+
+    def fail(self, error, max_attempts, retry_delay=0):
+        """Retry the job later, retry_delay seconds after the first attempt and twice as long after every
+        further one, or give up on it once it has used all its attempts"""
+        self.status = PENDING if self.attempts < max_attempts else FAILED
+        self.error = error
+        self.updated_at = time.time()
+        self.not_before = self.updated_at + retry_delay * 2 ** max(self.attempts - 1, 0)
+        db.session.commit()
+
+    def postpone(self, delay):
+        """Put the job back for a later try that does not count as an attempt, e.g. while the server is busy"""
+        self.status = PENDING
+        self.attempts -= 1
+        self.updated_at = time.time()
+        self.not_before = self.updated_at + delay
+        db.session.commit()
+
+    def save_to_db(self):
+        db.session.add(self)
+        db.session.commit()
+
+
+@event.listens_for(db.metadata, 'after_create')
+def add_not_before_column(target, connection, **kw):
+    """create_all() does not add columns to an existing table; jobs may predate not_before"""
+    columns = [row[1] for row in connection.execute(db.text('PRAGMA table_info(jobs)'))]
+    if 'not_before' not in columns:
+        connection.execute(db.text('ALTER TABLE jobs ADD COLUMN not_before FLOAT NOT NULL DEFAULT 0'))
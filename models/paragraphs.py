@@ -0,0 +1,46 @@
+from collections import defaultdict
+
+from db import chunked, db
+from models.spacy_models import JsonEncodedDict
+
+
+class ParagraphPartial(db.Model):
+    """Partial result of an analysis for one paragraph of a text, keyed by the paragraph's content hash,
+    so that an edited text only has its changed paragraphs parsed again"""
+    __tablename__ = 'paragraph_partials'
+
+    text_id = db.Column(db.Integer, primary_key=True)
+    paragraph_hash = db.Column(db.String(64), primary_key=True)
+    analysis_name = db.Column(db.String(100), primary_key=True)
+    partial = db.Column(JsonEncodedDict)
+
+    @classmethod
+    def find_by_text_id(cls, text_id):
+        """{paragraph hash: {analysis name: partial}} of a text"""
+        partials = defaultdict(dict)
+        for row in cls.query.filter_by(text_id=text_id):
+            partials[row.paragraph_hash][row.analysis_name] = row.partial
+        return dict(partials)
+
+    @classmethod
+    def replace_text(cls, text_id, partials, stored=None, commit=True):
+        """Keep the partials ({paragraph hash: {analysis name: partial}}) of a text's current paragraphs.
+        stored is what find_by_text_id gave before; rows of paragraphs that are gone are deleted and
+        only the rows that are not stored yet are written, so unchanged paragraphs cost nothing."""
+        stored = cls.find_by_text_id(text_id) if stored is None else stored
+        gone = [paragraph_hash for paragraph_hash in stored if paragraph_hash not in partials]
+        for chunk in chunked(gone):
+            cls.query.filter(cls.text_id == text_id, cls.paragraph_hash.in_(chunk)).delete(synchronize_session=False)
+        rows = [{'text_id': text_id, 'paragraph_hash': paragraph_hash, 'analysis_name': name, 'partial': partial}
+                for paragraph_hash, by_name in partials.items() for name, partial in by_name.items()
+                if name not in stored.get(paragraph_hash, {})]
+        if rows:
+            db.session.execute(cls.__table__.insert(), rows)
+        if commit:
+            db.session.commit()
+
+    @classmethod
+    def delete_by_text_id(cls, text_id, commit=True):
+        cls.query.filter_by(text_id=text_id).delete(synchronize_session=False)
+        if commit:
+            db.session.commit()
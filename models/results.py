@@ -1,21 +1,63 @@
+from collections import OrderedDict
+
+from sqlalchemy.dialects.sqlite import insert
+
 from db import db
 from models.spacy_models import JsonEncodedDict
 
 
 class Results(db.Model):
-    __tablename__ = 'Results'
+    """One row per analysis of a text, replaced whenever the text is analysed again"""
+    __tablename__ = 'analysis_results'
 
-    id = db.Column(db.Integer, primary_key=True)
+    text_id = db.Column(db.Integer, primary_key=True)
+    analysis_name = db.Column(db.String(100), primary_key=True)
+    text_hash = db.Column(db.String(64), index=True)  # hash of the text the results were computed from
     results = db.Column(JsonEncodedDict)
 
-    def __init__(self, results):
+    def __init__(self, text_id, analysis_name, text_hash, results):
+        self.text_id = text_id
+        self.analysis_name = analysis_name
+        self.text_hash = text_hash
         self.results = results
 
-    def save_to_db(self):
-        db.session.add(self)
-        db.session.commit()
+    @classmethod
+    def find_by_text_id(cls, text_id, text_hash=None):
+        """Results of a text by analysis name, only those computed from text_hash if it is given"""
+        query = cls.query.filter_by(text_id=text_id)
+        if text_hash is not None:
+            query = query.filter_by(text_hash=text_hash)
+        return {row.analysis_name: row.results for row in query}
+
+    @classmethod
+    def find_by_text_hash(cls, text_hash, analysis_names):
+        """Results of every named analysis computed from exactly this text for any text_id, or None"""
+        by_text_id = {}
+        for row in cls.query.filter(cls.text_hash == text_hash, cls.analysis_name.in_(list(analysis_names))):
+            by_text_id.setdefault(row.text_id, {})[row.analysis_name] = row.results
+        for results in by_text_id.values():
+            if len(results) == len(set(analysis_names)):
+                return OrderedDict((name, results[name]) for name in analysis_names)
+        return None
 
-    def delete_from_db(self):
-        db.session.delete(self)
-        db.session.commit()
+    @classmethod
+    def save_all(cls, text_id, text_hash, results, commit=True):
+        """Upsert every analysis result of a text with one statement in a single transaction.
+        With commit=False the rows join the caller's transaction instead."""
+        if not results:
+            return
+        rows = [{'text_id': text_id, 'analysis_name': name, 'text_hash': text_hash, 'results': result}
+                for name, result in results.items()]
+        statement = insert(cls.__table__).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=['text_id', 'analysis_name'],
+            set_={'text_hash': statement.excluded.text_hash, 'results': statement.excluded.results})
+        db.session.execute(statement)
+        if commit:
+            db.session.commit()
 
+    @classmethod
+    def delete_by_text_id(cls, text_id, commit=True):
+        cls.query.filter_by(text_id=text_id).delete()
+        if commit:
+            db.session.commit()
@@ -0,0 +1,100 @@
+from sqlalchemy import event
+
+from db import db
+
+# FTS5 table over the stored texts, its rowid is the spacy_db id (text_id may be any string). The porter
+# stemmer lets a word match its other inflections. words holds the words_without_stopwords output once
+# the text has been analysed; they are the words as written, not lemmas, and the stemmer does the rest.
+CREATE_TABLE = """
+CREATE VIRTUAL TABLE text_search USING fts5(
+    text_description, words, tokenize = 'porter unicode61 remove_diacritics 1'
+)
+"""
+
+# Triggers on spacy_db keep the index in sync with every write, including the bulk ones of ingest.py.
+# A changed text drops its words, they come back when it is analysed again. A PUT of the same text
+# leaves the index alone.
+TRIGGERS = {
+    'text_search_insert': """
+    CREATE TRIGGER text_search_insert AFTER INSERT ON spacy_db BEGIN
+        INSERT INTO text_search (rowid, text_description, words) VALUES (new.id, new.text_description, '');
+    END
+    """,
+    'text_search_update': """
+    CREATE TRIGGER text_search_update AFTER UPDATE OF text_description ON spacy_db
+    WHEN old.text_description IS NOT new.text_description BEGIN
+        DELETE FROM text_search WHERE rowid = old.id;
+        INSERT INTO text_search (rowid, text_description, words) VALUES (new.id, new.text_description, '');
+    END
+    """,
+    'text_search_delete': """
+    CREATE TRIGGER text_search_delete AFTER DELETE ON spacy_db BEGIN
+        DELETE FROM text_search WHERE rowid = old.id;
+    END
+    """,
+}
+
+FIELDS = ('text_description', 'words')
+
+
+class TextSearch:
+    """Ranked full-text search over the texts of spacy_db and their stopword-free words"""
+
+    @staticmethod
+    def create(connection):
+        """Create the index and its triggers if they are missing; a new index is filled with the stored texts"""
+        exists = connection.execute(db.text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'text_search'")).first()
+        keyed_by_text_id = connection.execute(db.text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'text_search_insert' "
+            "AND sql LIKE '%new.text_id%'")).first()
+        columns = [row[1] for row in connection.execute(db.text('PRAGMA table_info(text_search)'))] if exists else []
+        for name in TRIGGERS:  # recreated below, so a changed definition replaces the old one
+            connection.execute(db.text('DROP TRIGGER IF EXISTS ' + name))
+        if exists and 'lemmas' in columns:
+            # an index of an earlier version: the words column was called lemmas, and in the first version the
+            # rowid was the text_id. The analysed words are kept, rows are matched to spacy_db either way.
+            connection.execute(db.text('ALTER TABLE text_search RENAME TO text_search_old'))
+            connection.execute(db.text(CREATE_TABLE))
+            connection.execute(db.text(
+                "INSERT INTO text_search (rowid, text_description, words) "
+                "SELECT spacy_db.id, spacy_db.text_description, old.lemmas FROM spacy_db "
+                "JOIN text_search_old AS old ON old.rowid = spacy_db.{}".format('text_id' if keyed_by_text_id else 'id')))
+            connection.execute(db.text('DROP TABLE text_search_old'))
+        elif not exists:
+            connection.execute(db.text(CREATE_TABLE))
+        connection.execute(db.text("INSERT INTO text_search (rowid, text_description, words) "
+                                   "SELECT id, text_description, '' FROM spacy_db "
+                                   "WHERE id NOT IN (SELECT rowid FROM text_search)"))
+        for trigger in TRIGGERS.values():
+            connection.execute(db.text(trigger))
+
+    @classmethod
+    def set_words(cls, text_id, words, commit=True):
+        db.session.execute(db.text('UPDATE text_search SET words = :words '
+                                   'WHERE rowid = (SELECT id FROM spacy_db WHERE text_id = :text_id)'),
+                           {'words': ' '.join(words), 'text_id': text_id})
+        if commit:
+            db.session.commit()
+
+    @classmethod
+    def search(cls, query, field=None, limit=20, offset=0):
+        """Texts matching an FTS5 query, best bm25 score first. field limits the match to one column.
+        A malformed query raises sqlalchemy.exc.OperationalError."""
+        if field is not None:
+            query = '{} : ({})'.format(field, query)
+        rows = db.session.execute(db.text(
+            "SELECT spacy_db.text_id AS text_id, hits.score AS score, hits.snippet AS snippet FROM ("
+            "SELECT rowid AS id, bm25(text_search) AS score, snippet(text_search, 0, '[', ']', '...', 12) AS snippet "
+            "FROM text_search WHERE text_search MATCH :query "
+            "ORDER BY bm25(text_search) LIMIT :limit OFFSET :offset"
+            ") AS hits JOIN spacy_db ON spacy_db.id = hits.id ORDER BY hits.score"),
+            {'query': query, 'limit': limit, 'offset': offset})
+        # bm25() is lower for better matches; the response gives the usual higher-is-better score
+        return [{'text_id': row.text_id, 'score': -row.score, 'snippet': row.snippet} for row in rows]
+
+
+@event.listens_for(db.metadata, 'after_create')
+def create_text_search(target, connection, **kw):
+    """db.create_all() also sets up the search index"""
+    TextSearch.create(connection)
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import defaultdict
+
+from db import chunked, db
+from nlp import minhash
+
+CLUSTER_CACHE_SECONDS = 60  # clusters are recomputed at most this often while no signature changes
+
+_clusters = {}  # threshold -> (computed at, clusters)
+_clusters_lock = threading.Lock()
+
+
+def _forget_clusters():
+    with _clusters_lock:
+        _clusters.clear()
+
+
+class TextSignature(db.Model):
+    """MinHash signature of the stopword-free words of an analysed text"""
+    __tablename__ = 'text_signatures'
+    # Without a rowid the lone INTEGER primary key is an ordinary column, so a text_id that is not a
+    # number (POST /data/abc) is stored like in the other tables instead of failing with a datatype mismatch
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    text_id = db.Column(db.Integer, primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)
+
+    @classmethod
+    def save(cls, text_id, signature, commit=True):
+        """Replace the signature and LSH buckets of a text"""
+        cls.delete_by_text_id(text_id, commit=False)
+        db.session.execute(cls.__table__.insert(), {'text_id': text_id, 'signature': minhash.to_bytes(signature)})
+        db.session.execute(LshBucket.__table__.insert(),
+                           [{'band': band, 'bucket': bucket, 'text_id': text_id}
+                            for band, bucket in enumerate(minhash.bands(signature))])
+        _forget_clusters()
+        if commit:
+            db.session.commit()
+
+    @classmethod
+    def delete_by_text_id(cls, text_id, commit=True):
+        cls.delete_by_text_ids([text_id], commit)
+
+    @classmethod
+    def delete_by_text_ids(cls, text_ids, commit=True):
+        for chunk in chunked(text_ids):
+            cls.query.filter(cls.text_id.in_(chunk)).delete(synchronize_session=False)
+            LshBucket.query.filter(LshBucket.text_id.in_(chunk)).delete(synchronize_session=False)
+        _forget_clusters()
+        if commit:
+            db.session.commit()
+
+    @classmethod
+    def clusters(cls, threshold=0.8):
+        """Groups of texts linked by an estimated similarity of at least threshold, largest first,
+        computed once per CLUSTER_CACHE_SECONDS (and after every change made by this process)"""
+        with _clusters_lock:
+            cached = _clusters.get(threshold)
+            if cached is not None and time.time() - cached[0] < CLUSTER_CACHE_SECONDS:
+                return cached[1]
+        clusters = cls._clusters(threshold)
+        with _clusters_lock:
+            _clusters[threshold] = (time.time(), clusters)
+        return clusters
+
+    @classmethod
+    def _clusters(cls, threshold):
+        """Only the texts that share an LSH bucket with another text are compared, never all pairs"""
+        shared = db.session.query(LshBucket.band, LshBucket.bucket) \
+            .group_by(LshBucket.band, LshBucket.bucket).having(db.func.count() > 1).subquery()
+        rows = db.session.query(LshBucket.band, LshBucket.bucket, LshBucket.text_id) \
+            .join(shared, db.and_(LshBucket.band == shared.c.band, LshBucket.bucket == shared.c.bucket))
+        buckets = defaultdict(list)
+        for row in rows:
+            buckets[row.band, row.bucket].append(row.text_id)
+
+        candidates = list({text_id for text_ids in buckets.values() for text_id in text_ids})
+        signatures = {}
+        for chunk in chunked(candidates):
+            for row in cls.query.filter(cls.text_id.in_(chunk)):
+                signatures[row.text_id] = minhash.from_bytes(row.signature)
+
+        parent = {}
+
+        def find(text_id):
+            while parent.setdefault(text_id, text_id) != text_id:
+                parent[text_id] = parent[parent[text_id]]
+                text_id = parent[text_id]
+            return text_id
+
+        # Each text is compared with the first text of its bucket only, and not at all once the two are
+        # in one cluster already: N near-identical texts in a bucket cost N - 1 comparisons, not N^2
+        for text_ids in buckets.values():
+            representative = text_ids[0]
+            for text_id in text_ids[1:]:
+                if find(text_id) != find(representative) and \
+                        minhash.similarity(signatures[representative], signatures[text_id]) >= threshold:
+                    parent[find(text_id)] = find(representative)
+
+        groups = defaultdict(list)
+        for text_id in parent:
+            groups[find(text_id)].append(text_id)
+        return sorted((sorted(group) for group in groups.values() if len(group) > 1), key=lambda g: (-len(g), g[0]))
+
+
+class LshBucket(db.Model):
+    """The texts whose signatures are equal in one band; texts sharing a bucket are near-duplicate candidates"""
+    __tablename__ = 'lsh_buckets'
+
+    band = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.String(16), primary_key=True)
+    text_id = db.Column(db.Integer, primary_key=True, index=True)
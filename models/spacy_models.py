@@ -1,8 +1,13 @@
+import base64
 import json
+import zlib
 
 from sqlalchemy.ext import mutable
 from db import db
 
+COMPRESS_ABOVE = 4096  # JSON longer than this many characters is stored zlib compressed
+COMPRESSED_PREFIX = 'z:'  # marks a compressed value; plain JSON never starts with it
+
 
 # Model class
 class DataModel(db.Model):
@@ -10,7 +15,7 @@ class DataModel(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     text_id = db.Column(db.Integer, unique=True)
-    text_description = db.Column(db.String(1000))
+    text_description = db.Column(db.Text)  # no length limit, texts are analysed paragraph by paragraph
 
     def __init__(self, text_id, text_description):
         self.text_id = text_id
@@ -23,31 +28,43 @@ class DataModel(db.Model):
     def find_by_text_id(cls, text_id):  # Select * from spacy_db where text_id=text_id Limit=1
         return cls.query.filter_by(text_id=text_id).first()
 
+    @classmethod
+    def page(cls, after_id=0, limit=100):
+        """The next texts in id order after after_id. Seeking on the primary key costs the same
+        on every page, where an OFFSET would scan all the rows it skips."""
+        return cls.query.filter(cls.id > after_id).order_by(cls.id).limit(limit).all()
+
     def save_to_db(self):
         db.session.add(self)
         db.session.commit()
 
-    def delete_from_db(self):
+    def delete_from_db(self, commit=True):
         db.session.delete(self)
-        db.session.commit()
+        if commit:
+            db.session.commit()
 
 
 class JsonEncodedDict(db.TypeDecorator):
-    """Enables JSON storage by encoding and decoding on the fly."""
+    """Enables JSON storage by encoding and decoding on the fly.
+    Large values are stored as zlib compressed, base64 encoded JSON behind COMPRESSED_PREFIX;
+    both forms are read back, so rows written before compression keep working."""
     impl = db.Text
 
     def process_bind_param(self, value, dialect):
         if value is None:
             return '{}'
-        else:
-            print(value)
-            return json.dumps(value)
+        encoded = json.dumps(value, separators=(',', ':'))
+        if len(encoded) > COMPRESS_ABOVE:
+            compressed = base64.b64encode(zlib.compress(encoded.encode('utf-8'))).decode('ascii')
+            return COMPRESSED_PREFIX + compressed
+        return encoded
 
     def process_result_value(self, value, dialect):
         if value is None:
             return {}
-        else:
-            return json.loads(value)
+        if value.startswith(COMPRESSED_PREFIX):
+            value = zlib.decompress(base64.b64decode(value[len(COMPRESSED_PREFIX):])).decode('utf-8')
+        return json.loads(value)
 
 
 mutable.MutableDict.associate_with(JsonEncodedDict)
@@ -0,0 +1,167 @@
+import hashlib
+from collections import OrderedDict
+
+from nlp import operations
+from nlp.chunks import CHUNK_CHARS, paragraph_chunks
+from nlp.model import model_id
+
+BATCH_SIZE = 64  # texts handed to nlp.pipe at a time
+ANALYSIS_VERSION = 3  # bump whenever an operation's output changes, so cached responses go stale
+
+# Response key -> operation. Every operation reads the same parsed Doc.
+ANALYSES = OrderedDict([
+    ('word_without_stopwords', operations.words_without_stopwords),
+    ('nouns', operations.total_nouns),
+    ('adjectives', operations.total_adjectives),
+    ('verbs', operations.total_verbs),
+    ('noun_noun_phrases', operations.noun_noun_phrase),
+    ('noun_adj_phrases', operations.noun_adj_phrase),
+    ('adj_noun_phrases', operations.adj_noun_phrase),
+    ('sentences_with_one_or_more_nouns', operations.sentences_with_two_or_more_nouns),
+    ('sentences_with_one_or_more_adj', operations.sentences_with_two_or_more_adj),
+    ('sentences_with_one_or_more_verbs', operations.sentences_with_two_or_more_verbs),
+    ('sentences_without_nouns', operations.sentences_without_noun),
+    ('sentences_without_adjectives', operations.sentences_without_adj),
+    ('sentences_without_verbs', operations.sentences_without_verbs),
+    ('person_names', operations.person_names),
+    ('sentences_with_different_tenses', operations.tense),
+])
+
+# These results are sent back as strings in the response
+STRINGIFIED = {'sentences_with_one_or_more_nouns',
+               'sentences_with_one_or_more_adj',
+               'sentences_with_one_or_more_verbs',
+               'sentences_without_nouns',
+               'sentences_without_adjectives',
+               'sentences_without_verbs'}
+
+
+# Corpus frequency category -> (response key, key of its frequency Counter in the result)
+TERM_CATEGORIES = OrderedDict([
+    ('noun', ('nouns', 'noun_frequency')),
+    ('adj', ('adjectives', 'adj_frequency')),
+    ('verb', ('verbs', 'verb_frequency')),
+    ('name', ('person_names', 'person_name_frequency')),
+    ('noun_noun_phrase', ('noun_noun_phrases', 'noun_noun_phrase_frequency')),
+    ('noun_adj_phrase', ('noun_adj_phrases', 'noun_adj_phrase_frequency')),
+    ('adj_noun_phrase', ('adj_noun_phrases', 'adj_noun_phrase_frequency')),
+])
+
+
+def select(names):
+    """The analyses named in a comma separated list, all of them for an empty one"""
+    if not names:
+        return list(ANALYSES)
+    selected = [name.strip() for name in names.split(',') if name.strip()]
+    unknown = [name for name in selected if name not in ANALYSES]
+    if unknown:
+        raise ValueError('Unknown analyses: {}. Available: {}'.format(', '.join(unknown), ', '.join(ANALYSES)))
+    return selected
+
+
+def text_hash(text_description):
+    """Content hash of the text as the pipeline sees it (lowercased), tied to the loaded model"""
+    key = '{}\n{}'.format(model_id(), str(text_description).lower())
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def etag(text_description, analyses=None):
+    """Strong validator of the response for this text and selection of analyses: it only changes
+    with the text, the model (both in text_hash), ANALYSIS_VERSION or the selection"""
+    analyses = list(ANALYSES) if analyses is None else analyses
+    key = '{}\n{}\n{}'.format(text_hash(text_description), ANALYSIS_VERSION, ','.join(analyses))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def components_for(analyses):
+    """Union of the pipeline components the given analyses need"""
+    return frozenset().union(*(ANALYSES[name].requires for name in analyses))
+
+
+def content_hash(text_description):
+    """Key of the results (or partials) computed from a text or paragraph; they are only reused for the
+    same model and ANALYSIS_VERSION"""
+    key = '{}\n{}'.format(text_hash(text_description), ANALYSIS_VERSION)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def analyse_paragraphs(text_description, analyses=None, cached=None, max_chars=CHUNK_CHARS):
+    """Analyse a text paragraph by paragraph (split at blank lines, a paragraph longer than max_chars
+    cut at whitespace), parsing only the paragraphs without partial results in cached ({paragraph
+    hash: {analysis name: partial}}, e.g. of an earlier version of the text). The paragraphs stream
+    through the pipeline, so a text of any length stays under the model's max_length. Returns the
+    results and the partials of the current paragraphs."""
+    analyses = list(ANALYSES) if analyses is None else analyses
+    pieces = list(paragraph_chunks(text_description, max_chars)) or ['']  # an empty text still gets its results
+    hashes = [content_hash(piece) for piece in pieces]
+    cached = cached or {}
+
+    partials, missing = {}, OrderedDict()
+    for key, piece in zip(hashes, pieces):
+        if all(name in cached.get(key, {}) for name in analyses):
+            partials[key] = {name: cached[key][name] for name in analyses}
+        else:
+            missing[key] = piece
+    if missing:
+        docs = operations.pipe(missing.values(), components_for(analyses), BATCH_SIZE)
+        for key, doc in zip(missing, docs):
+            partials[key] = {name: ANALYSES[name].extract(doc) for name in analyses}
+
+    merged = {}
+    for key in hashes:  # in document order, repeated paragraphs count every time
+        for name in analyses:
+            operation = ANALYSES[name]
+            merged[name] = operation.merge(merged[name], partials[key][name]) if name in merged \
+                else partials[key][name]
+    return OrderedDict((name, ANALYSES[name].summarize(merged[name])) for name in analyses), partials
+
+
+def _pieces(texts):
+    """(piece, is the last piece of its text) for the paragraphs of every text; a text without any
+    paragraph is one empty piece, so that every text still gets its results"""
+    for text_description in texts:
+        pieces = list(paragraph_chunks(text_description)) or ['']
+        for i, piece in enumerate(pieces, start=1):
+            yield piece, i == len(pieces)
+
+
+def analyse_batch(texts, analyses=None, batch_size=BATCH_SIZE, n_process=1):
+    """Stream the texts through nlp.pipe and yield the results of each text as soon as it is parsed.
+    The texts are parsed paragraph by paragraph, as analyse_paragraphs does: a text of any length
+    stays under the model's max_length, and its results are the ones PUT stores for it. A text whose
+    analysis raises yields the exception instead of results, and the texts after it go on."""
+    analyses = list(ANALYSES) if analyses is None else analyses
+    merged, error = {}, None
+    for doc, last in operations.pipe(_pieces(texts), components_for(analyses), batch_size, n_process,
+                                     as_tuples=True):
+        if error is None:
+            try:
+                for name in analyses:
+                    operation = ANALYSES[name]
+                    partial = operation.extract(doc)
+                    merged[name] = operation.merge(merged[name], partial) if name in merged else partial
+            except Exception as e:
+                error = e
+        if last:
+            results = error
+            if error is None:
+                try:
+                    results = OrderedDict((name, ANALYSES[name].summarize(merged[name])) for name in analyses)
+                except Exception as e:
+                    results = e
+            yield results
+            merged, error = {}, None
+
+
+def term_counts(results):
+    """Term frequencies by corpus category, for the analyses that are in the results"""
+    counts = OrderedDict()
+    for category, (name, frequency_key) in TERM_CATEGORIES.items():
+        if name in results:
+            counts[category] = dict((results[name] or {}).get(frequency_key, {}))
+    return counts
+
+
+def to_response(results):
+    """Shape the analysis results the way GET /data/<text_id> returns them"""
+    return {name: str(result) if name in STRINGIFIED else result for name, result in results.items()}
@@ -0,0 +1,33 @@
+import re
+
+CHUNK_CHARS = 100000  # characters the pipeline is given at a time, well below spaCy's max_length
+
+# A run of whitespace holding a blank line, the paragraph boundary total_adjectives counts
+PARAGRAPH_BREAK = re.compile(r'[^\S\n]*\n[^\S\n]*\n\s*')
+
+
+def paragraphs(text):
+    """Split the text at blank lines; each paragraph keeps the whitespace that ends it"""
+    start = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        yield text[start:match.end()]
+        start = match.end()
+    if start < len(text):
+        yield text[start:]
+
+
+def _split_long(paragraph, max_chars):
+    """Cut a paragraph that is longer than a chunk at the last whitespace before the limit"""
+    while len(paragraph) > max_chars:
+        cut = paragraph.rfind(' ', 0, max_chars)
+        cut = max_chars if cut <= 0 else cut + 1
+        yield paragraph[:cut]
+        paragraph = paragraph[cut:]
+    if paragraph:
+        yield paragraph
+
+
+def paragraph_chunks(text, max_chars=CHUNK_CHARS):
+    """Every paragraph on its own, the ones longer than max_chars cut at whitespace"""
+    for paragraph in paragraphs(str(text)):
+        yield from _split_long(paragraph, max_chars)
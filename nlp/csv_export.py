@@ -0,0 +1,76 @@
+from utils.csv_writer import background_writer, create_csv, create_csv_list, create_csv_dictionary
+
+
+def _word_files(writes, result, key, list_file, count_file, frequency_file, favorite_file):
+    """Queue the list, count, frequency and favorite csv files of one word or phrase analysis.
+    Each file argument is (filename, header...) and favorite_file also names its result key."""
+    items = result.get(key, [])
+    writes.append((create_csv_list,) + list_file + (items,))
+    writes.append((create_csv,) + count_file + (len(items),))
+    writes.append((create_csv_dictionary,) + frequency_file[:3] + (result.get(frequency_file[3], {}),))
+    if favorite_file and favorite_file[2] in result:
+        writes.append((create_csv,) + favorite_file[:2] + (result[favorite_file[2]],))
+
+
+def csv_writes(results):
+    """The csv files of the analysis results, with the same names and headers the operations used to write"""
+    writes = []
+    result = results.get('word_without_stopwords') or {}
+    if 'text_without_stopwords' in result:
+        writes.append((create_csv_list, "text_without_stopwords.csv", "text_without_stopwords",
+                       result['text_without_stopwords']))
+
+    result = results.get('nouns') or {}
+    if result:
+        _word_files(writes, result, 'nouns', ("noun_list.csv", "Noun_list"), ("total_no_of_noun.csv", "Total_noun"),
+                    ("noun_frequency.csv", "nouns", "frequency", 'noun_frequency'),
+                    ("favorite_noun.csv", "favorite_noun", 'favorite_noun'))
+
+    result = results.get('adjectives') or {}
+    if result:
+        _word_files(writes, result, 'adjectives', ("adjective_lists.csv", "Adjective_list"),
+                    ("total_no_of_adj.csv", "Total_no_of_adjectives"),
+                    ("adj_frequency.csv", "Adjectives", "Frequency", 'adj_frequency'),
+                    ("favorite_adjective.csv", "Favorite_adjective", 'favorite_adjective'))
+        if 'top_ten_adjectives' in result:
+            writes.append((create_csv_list, "top_10_adj.csv", "Top_ten_adjective_list", result['top_ten_adjectives']))
+
+    result = results.get('verbs') or {}
+    if result:
+        _word_files(writes, result, 'verbs', ("verb_list.csv", "Verb_list"), ("total_no_of_verbs.csv", "Total_no_of_verbs"),
+                    ("verb_frequency.csv", "Verbs", "Frequency", 'verb_frequency'),
+                    ("favorite_verb.csv", "Favorite_verbs", 'favorite_verb'))
+
+    result = results.get('noun_noun_phrases') or {}
+    if result:
+        _word_files(writes, result, 'noun_noun_phrases', ("noun_noun_phrase_list.csv", "Noun_noun_phrase_list"),
+                    ("total_noun_noun_phrase.csv", "Noun_noun_phrases"),
+                    ("noun_noun_phrase_frequency.csv", "Noun_Noun_phrase", "Frequency", 'noun_noun_phrase_frequency'),
+                    ("favorite_noun_noun.csv", "Favorite_noun_noun_phrase", 'favorite_noun_noun_phrase'))
+
+    result = results.get('noun_adj_phrases') or {}
+    if result:
+        _word_files(writes, result, 'noun_adj_phrases', ("noun_adj_phrase_list.csv", "Noun_adj_phrase_list"),
+                    ("total_noun_adj.csv", "Total_noun_adj"),
+                    ("noun_adj_frequency.csv", "Noun_adj_phrases", "Frequency", 'noun_adj_phrase_frequency'),
+                    ("favorite_noun_adj.csv", "Favorite_noun_adj_phrase", 'favorite_noun_adj_phrase'))
+
+    result = results.get('adj_noun_phrases') or {}
+    if result:
+        _word_files(writes, result, 'adj_noun_phrases', ("adj_noun_phrase_list.csv", "Adj_noun_phrase_list"),
+                    ("total_adj_noun.csv", "Total_adj_noun"),
+                    ("adj_noun_frequency.csv", "Adj_noun_phrases", "Frequency", 'adj_noun_phrase_frequency'),
+                    ("favorite_adj_noun.csv", "Favorite_adj_noun_phrase", 'favorite_adj_noun_phrase'))
+
+    if 'person_names' in results:
+        # The name files are written even when no names were found
+        _word_files(writes, results['person_names'] or {}, 'person_names', ("name_list.csv", "Person_name_list"),
+                    ("total_no_of_names.csv", "Total_no_of_person_names"),
+                    ("name_frequency.csv", "Person_name", "Frequency", 'person_name_frequency'), None)
+    return writes
+
+
+def export(results, directory):
+    """Hand the csv files of the results to the background writer; nothing is written on the caller's thread"""
+    for function, *args in csv_writes(results):
+        background_writer.submit(function, *args, directory=directory)
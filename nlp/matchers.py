@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+
+from spacy.matcher import Matcher
+
+from nlp import model
+
+# Pattern registry: match name -> token patterns. Every registered pattern is compiled into
+# the one shared Matcher, so a Doc is matched once however many patterns there are.
+PATTERNS = OrderedDict()
+
+_matchers = {}  # one compiled Matcher for the Vocab of the current model
+_lock = threading.Lock()
+
+
+def register_pattern(name, *patterns):
+    """Add patterns under a match name; matchers that are already compiled pick them up too"""
+    with _lock:
+        PATTERNS.setdefault(name, []).extend(patterns)
+        for matcher in _matchers.values():
+            matcher.add(name, None, *patterns)
+
+
+def get_matcher(vocab):
+    """The shared Matcher for a Vocab, compiled on first use. Only the current model's Matcher is kept:
+    a request that still holds a Doc of a replaced model gets a Matcher of its own, which would otherwise
+    keep the old Vocab alive after forget_matchers() has run."""
+    with _lock:
+        matcher = _matchers.get(vocab)
+        if matcher is None:
+            matcher = Matcher(vocab)
+            for name, patterns in PATTERNS.items():
+                matcher.add(name, None, *patterns)
+            if vocab is model.get_nlp().vocab:
+                _matchers[vocab] = matcher
+        return matcher
+
+
+def forget_matchers():
+    """Drop the compiled Matchers, they keep the Vocab of a replaced model alive"""
+    with _lock:
+        _matchers.clear()
+
+
+def matches(doc):
+    """Match spans of a Doc by match name, from a single pass kept on the Doc for the other analyses"""
+    found = doc.user_data.get('matches')
+    if found is None:
+        found = {name: [] for name in PATTERNS}
+        for match_id, start, end in get_matcher(doc.vocab)(doc):
+            found.setdefault(doc.vocab.strings[match_id], []).append((start, end))
+        doc.user_data['matches'] = found
+    return found
+
+
+register_pattern('NOUN_ADJ_PATTERN', [{'POS': 'NOUN'}, {'POS': 'ADJ'}])
+register_pattern('ADJ_NOUN_PATTERN', [{'POS': 'ADJ'}, {'POS': 'NOUN'}])
+register_pattern('SENTENCES_WITH_2_OR_MORE_NOUNS', [{'POS': 'NOUN'}, {'POS': 'NOUN'}, {'POS': 'NOUN', 'OP': '*'}])
+register_pattern('SENTENCES_WITH_2_OR_MORE_ADJ', [{'POS': 'ADJ'}, {'POS': 'ADJ'}, {'POS': 'ADJ', 'OP': '*'}])
+register_pattern('SENTENCES_WITH_2_OR_MORE_VERB', [{'POS': 'VERB'}, {'POS': 'VERB'}, {'POS': 'VERB', 'OP': '*'}])
+
+model.on_reload(forget_matchers)
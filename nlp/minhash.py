@@ -0,0 +1,66 @@
+"""MinHash signatures and LSH bands for finding near-duplicate texts.
+
+A text is the set of its word shingles (SHINGLE_SIZE consecutive stopword-free words). The share of
+equal MinHash values of two signatures estimates the Jaccard similarity of those sets. Texts whose
+signatures are equal in at least one band of ROWS values land in the same bucket; with 16 bands of 8
+rows, pairs are likely to meet from a similarity of about (1/16) ** (1/8) = 0.7 on.
+"""
+import hashlib
+import zlib
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+BLOCK_SIZE = 1024  # shingles hashed at a time
+
+_PRIME = (1 << 31) - 1  # a * x + b stays below 2 ** 63 for 31 bit values, no uint64 overflow
+_random = np.random.RandomState(1)  # fixed, signatures are stored and compared across processes
+_A = _random.randint(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _random.randint(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(words, size=SHINGLE_SIZE):
+    words = [str(word) for word in words]
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def signature(words):
+    """MinHash signature of the shingles of the words, NUM_PERM uint32 values; None without words"""
+    hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) & _PRIME for shingle in shingles(words)),
+                         dtype=np.uint64)
+    if not len(hashes):
+        return None
+    # A running minimum over blocks of shingles keeps the work array at BLOCK_SIZE x NUM_PERM, about
+    # 1 MB, whatever the length of the text
+    minimum = np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    for start in range(0, len(hashes), BLOCK_SIZE):
+        block = np.outer(hashes[start:start + BLOCK_SIZE], _A)
+        block += _B
+        block %= _PRIME
+        np.minimum(minimum, block.min(axis=0), out=minimum)
+    return minimum.astype(np.uint32)
+
+
+def to_bytes(signature):
+    return signature.astype('<u4').tobytes()
+
+
+def from_bytes(data):
+    return np.frombuffer(data, dtype='<u4')
+
+
+def bands(signature):
+    """One bucket key per band; texts sharing a key are near-duplicate candidates"""
+    data = to_bytes(signature)
+    step = ROWS * 4
+    return [hashlib.blake2b(data[i:i + step], digest_size=8).hexdigest() for i in range(0, len(data), step)]
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of the texts of two signatures"""
+    return float(np.mean(first == second))
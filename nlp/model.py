@@ -0,0 +1,152 @@
+import functools
+import gc
+import os
+import threading
+import time
+from importlib import metadata
+
+import spacy
+
+from utils import metrics
+
+MODEL_NAME = os.environ.get('SPACY_MODEL', 'en_core_web_sm')
+WARM_UP_TEXT = "The quick brown fox jumps over the lazy dog. John Smith wrote a short, simple sentence."
+
+# Memory budget: every new string of the users' texts stays in the model's StringStore for good, so
+# past MAX_STRINGS entries or MAX_RSS_MB of resident memory the model is replaced by a fresh copy.
+# 0 turns a limit off. MIN_RELOAD_INTERVAL keeps an RSS that does not shrink from reloading in a loop.
+MAX_STRINGS = int(os.environ.get('MAX_STRINGS', '0'))
+MAX_RSS_MB = int(os.environ.get('MAX_RSS_MB', '0'))
+MIN_RELOAD_INTERVAL = float(os.environ.get('MIN_RELOAD_INTERVAL', '300'))
+
+_nlp = None
+_lock = threading.Lock()
+_ready = threading.Event()
+_reload_listeners = []
+_reloading = False
+_last_reload = 0.0
+
+
+def get_nlp():
+    """The shared spaCy pipeline, loaded on first use and only once per process"""
+    global _nlp
+    if _nlp is None:
+        with _lock:
+            if _nlp is None:
+                _nlp = spacy.load(MODEL_NAME)
+    return _nlp
+
+
+@functools.lru_cache(maxsize=None)
+def model_id():
+    """Name and version of the model, read from its package so that the model need not be loaded"""
+    try:
+        version = metadata.version(MODEL_NAME)
+    except metadata.PackageNotFoundError:  # loaded from a path rather than an installed package
+        version = get_nlp().meta.get('version')
+    return '{}-{}'.format(MODEL_NAME, version)
+
+
+def rss_bytes():
+    """Resident memory of the process, the peak where /proc is not available"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def memory_stats():
+    nlp = _nlp
+    return {'strings': len(nlp.vocab.strings) if nlp is not None else 0,
+            'lexemes': len(nlp.vocab) if nlp is not None else 0,
+            'rss_bytes': rss_bytes()}
+
+
+def on_reload(callback):
+    """Call callback after the model has been replaced, to drop what was built for the old one"""
+    _reload_listeners.append(callback)
+
+
+def over_budget(stats):
+    return bool((MAX_STRINGS and stats['strings'] > MAX_STRINGS) or
+                (MAX_RSS_MB and stats['rss_bytes'] > MAX_RSS_MB * 1024 * 1024))
+
+
+def check_memory(background=True):
+    """Start a reload of the model when it has outgrown the memory budget; cheap when it has not"""
+    global _reloading
+    if not (MAX_STRINGS or MAX_RSS_MB) or _nlp is None or time.time() - _last_reload < MIN_RELOAD_INTERVAL:
+        return False
+    if not over_budget(memory_stats()):
+        return False
+    with _lock:
+        if _reloading:
+            return False
+        _reloading = True
+    if background:
+        threading.Thread(target=reload, name='model-reload', daemon=True).start()
+    else:
+        reload()
+    return True
+
+
+def reload():
+    """Load and warm up a fresh copy of the model, then swap it in with one assignment. Requests that
+    already hold the old pipeline finish with it; the next ones get the new one, and the old one's
+    StringStore is freed once the last of them is done."""
+    global _nlp, _reloading, _last_reload
+    from nlp.matchers import get_matcher
+
+    try:
+        before = memory_stats()
+        nlp = spacy.load(MODEL_NAME)
+        get_matcher(nlp.vocab)(nlp(WARM_UP_TEXT.lower()))
+        with _lock:
+            _nlp = nlp
+            _last_reload = time.time()
+        for callback in _reload_listeners:
+            callback()
+        gc.collect()
+        metrics.inc('spacyapi_model_reloads_total')
+        print('model reloaded: {strings} strings, {rss_bytes} bytes resident before'.format(**before))
+    except Exception as e:
+        print('model reload failed:', e)
+    finally:
+        _reloading = False
+
+
+def warm_up():
+    """Load the model and run a dummy parse through the whole pipeline so the first request does not pay for it"""
+    from nlp.matchers import get_matcher
+
+    nlp = get_nlp()
+    doc = nlp(WARM_UP_TEXT.lower())
+    get_matcher(nlp.vocab)(doc)
+    _ready.set()
+
+
+def warm_up_in_background():
+    thread = threading.Thread(target=warm_up, name='model-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def preload():
+    """Warm up before the server forks its workers, so they share the model's memory pages
+    copy-on-write; gc.freeze keeps the collector from touching (and so copying) those pages"""
+    warm_up()
+    gc.freeze()
+
+
+metrics.register_gauge('spacyapi_string_store_size', lambda: {(): memory_stats()['strings']},
+                       'Strings in the StringStore of the loaded model')
+metrics.register_gauge('spacyapi_vocab_size', lambda: {(): memory_stats()['lexemes']},
+                       'Lexemes in the Vocab of the loaded model')
+metrics.register_gauge('spacyapi_rss_bytes', lambda: {(): rss_bytes()}, 'Resident memory of the process')
+metrics.HELP['spacyapi_model_reloads_total'] = 'Times the model was replaced for outgrowing the memory budget'
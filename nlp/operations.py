@@ -1,109 +1,229 @@
-import spacy
-from spacy.matcher import Matcher
-from collections import Counter
-from utils.csv_writer import create_csv, create_csv_list, create_csv_dictionary
-
-nlp = spacy.load("en_core_web_sm")
+import functools
+import itertools
 
+import numpy as np
+from spacy.parts_of_speech import NOUN, ADJ, VERB
+from spacy.tokens import Doc
+from collections import Counter
 
-def words_without_stopwords(text_description):
+from nlp.matchers import matches
+from nlp.model import get_nlp
+from nlp.token_array import token_array, PRESENT_TAGS, PAST_TAGS, FUTURE_TAGS
+from utils import metrics
+
+
+def __getattr__(name):
+    # operations.nlp is still the shared pipeline, but it is only loaded when first used
+    if name == 'nlp':
+        return get_nlp()
+    raise AttributeError(name)
+
+
+def disabled_components(components):
+    """Pipeline components that can be switched off when only `components` are needed"""
+    return [name for name in get_nlp().pipe_names if name not in components]
+
+
+def parse(text_description, components=None):
+    """Parse the text once, or hand back the Doc unchanged if it is already parsed.
+    Only the given pipeline components run; all of them run when components is None."""
+    if isinstance(text_description, Doc):
+        return text_description
+    disable = [] if components is None else disabled_components(components)
+    nlp = get_nlp()
+    text = str(text_description).lower()
+    if not metrics.ENABLED or len(text) > nlp.max_length:  # nlp() raises the max_length error itself
+        return nlp(text, disable=disable)
+
+    # The same steps as nlp(text), with every pipeline component timed on its own
+    with metrics.timed('spacyapi_component_seconds', component='tokenizer'):
+        doc = nlp.make_doc(text)
+    for name, component in nlp.pipeline:
+        if name not in disable:
+            with metrics.timed('spacyapi_component_seconds', component=name):
+                doc = component(doc)
+    metrics.inc('spacyapi_docs_total')
+    metrics.inc('spacyapi_tokens_total', len(doc))
+    return doc
+
+
+def pipe(texts, components=None, batch_size=64, n_process=1, as_tuples=False):
+    """Parse many texts like nlp.pipe, with only the given components. Every component is timed as in
+    parse(), once per batch of texts; a run over several processes can only be counted, not timed."""
+    if as_tuples:
+        texts, contexts = itertools.tee(texts)
+        yield from zip(pipe((text for text, _ in texts), components, batch_size, n_process),
+                       (context for _, context in contexts))
+        return
+    nlp = get_nlp()
+    disable = [] if components is None else disabled_components(components)
+    lowered = (str(text).lower() for text in texts)
+    if not metrics.ENABLED or n_process > 1:
+        batches = [nlp.pipe(lowered, batch_size=batch_size, n_process=n_process, disable=disable)]
+    else:
+        batches = _timed_batches(nlp, lowered, batch_size, disable)
+    for docs in batches:
+        for doc in docs:
+            metrics.inc('spacyapi_docs_total')
+            metrics.inc('spacyapi_tokens_total', len(doc))
+            yield doc
+
+
+def _timed_batches(nlp, texts, batch_size, disable):
+    """The steps of nlp.pipe, run over one batch of texts at a time so that each component can be timed"""
+    while True:
+        batch = list(itertools.islice(texts, batch_size))
+        if not batch:
+            return
+        with metrics.timed('spacyapi_component_seconds', component='tokenizer'):
+            docs = [nlp.make_doc(text) for text in batch]
+        for name, component in nlp.pipeline:
+            if name not in disable:
+                with metrics.timed('spacyapi_component_seconds', component=name):
+                    if hasattr(component, 'pipe'):
+                        docs = list(component.pipe(docs, batch_size=batch_size))
+                    else:
+                        docs = [component(doc) for doc in docs]
+        yield docs
+
+
+def requires(*components):
+    """Declare the pipeline components an operation reads from the Doc (the tokenizer always runs).
+    A plain text passed to the operation is parsed with only those components."""
+    def decorator(operation):
+        @functools.wraps(operation)
+        def wrapper(text_description):
+            return operation(parse(text_description, wrapper.requires))
+        wrapper.requires = frozenset(components)
+        return wrapper
+    return decorator
+
+
+def merge_partials(first, second):
+    """Partial results of two consecutive chunks as if they came from one Doc: lists are joined, counts added"""
+    merged = dict(first)
+    for key, value in second.items():
+        merged[key] = merged[key] + value if key in merged else value
+    return merged
+
+
+def summarizes(extract, merge=merge_partials):
+    """Split an operation into extract(doc), which pulls a partial result out of a Doc, and the decorated
+    summary of that partial. A long document can then be analysed chunk by chunk, with the partials
+    of the chunks merged before the one summary. Both steps are timed per operation."""
+    def decorator(summarize):
+        name = summarize.__name__
+
+        def timed_extract(doc):
+            with metrics.timed('spacyapi_operation_seconds', operation=name, step='extract'):
+                return extract(doc)
+
+        def timed_summarize(partial):
+            with metrics.timed('spacyapi_operation_seconds', operation=name, step='summarize'):
+                return summarize(partial)
+
+        @functools.wraps(summarize)
+        def operation(doc):
+            return timed_summarize(timed_extract(doc))
+        operation.extract = timed_extract
+        operation.merge = merge
+        operation.summarize = timed_summarize
+        return operation
+    return decorator
+
+
+def stopword_free_words(doc):
+    tokens = token_array(doc)
+    # Token is a spacy.tokens.doc.Doc object and cannot be Json serialized, we need to convert it into string again
+    return {'words': tokens.texts(~(tokens.is_stop | tokens.is_punct | tokens.is_space))}
+
+
+@requires()
+@summarizes(stopword_free_words)
+def words_without_stopwords(partial):
     """Words without stop_words, spaces, punctuations"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    doc = nlp(str(text_description).lower())
-    # Expected is string type object but text is list and converting into lowercase
     try:
-        text_without_stopwords = [str(token) for token in doc if token.is_stop is False if token.is_punct is False \
-                                  if token.is_space is False]
-        # Token is a spacy.tokens.doc.Doc object and cannot be Json serialized, we need to convert it into string again
-        create_csv_list("text_without_stopwords.csv", "text_without_stopwords", text_without_stopwords)
-        return {'text_without_stopwords': text_without_stopwords}
+        return {'text_without_stopwords': partial['words']}
     except Exception:
         return {'message': 'No words'}
 
 
-def total_nouns(text_description):
-    """Noun words, total no of nouns, nouns frequencies"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    doc = nlp(str(text_description).lower())
+def pos_words(pos):
+    def extract(doc):
+        tokens = token_array(doc)
+        return {'words': tokens.texts(tokens.is_pos(pos))}
+    return extract
 
-    nouns = [token.text for token in doc if token.pos_ == 'NOUN']
-    create_csv_list("noun_list.csv", "Noun_list", nouns)
-    create_csv("total_no_of_noun.csv", "Total_noun", len(nouns))
+
+@requires('tagger')
+@summarizes(pos_words(NOUN))
+def total_nouns(partial):
+    """Noun words, total no of nouns, nouns frequencies"""
+    nouns = partial['words']
+    if not nouns:
+        return {'message': 'No nouns'}
 
     noun_frequency = Counter(nouns)
-    create_csv_dictionary("noun_frequency.csv", "nouns", "frequency", noun_frequency)
 
     favorite_noun = max(noun_frequency, key=noun_frequency.get)
-    create_csv("favorite_noun.csv", "favorite_noun", favorite_noun)
     return {'nouns': nouns,
             'noun_count': len(nouns),
             'noun_frequency': noun_frequency,
             'favorite_noun': favorite_noun}
 
 
-def total_adjectives(text_description):
+def adjective_counts(doc):
+    tokens = token_array(doc)
+    is_adj = tokens.is_pos(ADJ)
+    in_paragraphs, in_last_paragraph = tokens.per_paragraph(is_adj)
+    return {'words': tokens.texts(is_adj),
+            # every sentence with adjectives is counted once, as the earlier loop over doc.sents did
+            'sentences_with_adj': int(np.count_nonzero(tokens.per_sentence(is_adj))),
+            'adj_in_paragraphs': [int(count) for count in in_paragraphs],
+            'adj_in_last_paragraph': in_last_paragraph}
+
+
+def merge_adjective_counts(first, second):
+    """The open last paragraph of the first chunk goes on in the second, up to the second's first blank line.
+    A chunk cut from a long paragraph has no blank line, and the paragraph stays open after it."""
+    in_paragraphs = list(second['adj_in_paragraphs'])
+    in_last_paragraph = second['adj_in_last_paragraph']
+    if in_paragraphs:
+        in_paragraphs[0] += first['adj_in_last_paragraph']
+    else:
+        in_last_paragraph += first['adj_in_last_paragraph']
+    return {'words': first['words'] + second['words'],
+            'sentences_with_adj': first['sentences_with_adj'] + second['sentences_with_adj'],
+            'adj_in_paragraphs': first['adj_in_paragraphs'] + in_paragraphs,
+            'adj_in_last_paragraph': in_last_paragraph}
+
+
+@requires('tagger', 'parser')
+@summarizes(adjective_counts, merge_adjective_counts)
+def total_adjectives(partial):
     """Adjectives, total no of adjectives, adjective frequencies"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    print(nlp.pipe_names)
-    doc = nlp(str(text_description).lower())
-
-    adjectives = [token.text for token in doc if token.pos_ == 'ADJ']
-    create_csv("total_no_of_adj.csv", "Total_no_of_adjectives", len(adjectives))
-    create_csv_list("adjective_lists.csv", "Adjective_list", adjectives)
+    adjectives = partial['words']
+    if not adjectives:
+        return {'message': 'No adjectives'}
 
     adj_frequency = Counter(adjectives)
-    create_csv_dictionary("adj_frequency.csv", "Adjectives", "Frequency", adj_frequency)
 
     favorite_adjective = max(adj_frequency, key=adj_frequency.get)
-    create_csv("favorite_adjective.csv", "Favorite_adjective", favorite_adjective)
 
     list_of_tuples = sorted(adj_frequency.items(), reverse=True, key=lambda x: x[1])
     top_ten_adjectives = list_of_tuples[:10]
-    create_csv_list("top_10_adj.csv", "Top_ten_adjective_list", top_ten_adjectives)
-
-    sents = doc.sents
-    sentences_with_adj = []
 
     """Finding the average number of adjectives in each sentences"""
-    # finding the sentences with adjectives
-    for sent in sents:
-        for token in sent:
-            if token.pos_ == "ADJ":
-                sentences_with_adj.append(sent)
-                break
-
-    # finding the number of adjectives in sentences from sentences_with_adjectives
-    sentences_and_adj_count = Counter(sentences_with_adj)
-
-    # counting the average number of adjectives in each sentences
-    count = 0
-    sum = 0
-    for key in sentences_and_adj_count:
-        count += 1
-        sum += sentences_and_adj_count[key]
+    count = sum = partial['sentences_with_adj']
     avg_in_sentences = sum / count
 
     """Average number of adjectives in each paragraph"""
-    # Splitting the text into paragraphs
-    start = 0
-    paragraph_list, paragraphs_with_adjectives = [], []
-    for token in doc:
-        if token.is_space and token.text.count("\n") > 1:
-            paragraph_list.append(doc[start:token.i])
-            start = token.i
-
-    for para in paragraph_list:
-        for token in para:
-            if token.pos_ == "ADJ":
-                paragraphs_with_adjectives.append(para)
-
-    # Counting the total number of adjectives in each paragraphs
-    paragraphs_and_adj_count = Counter(paragraphs_with_adjectives)
-
-    # Counting the average number of adjectives in each paragraphs
-    for key in paragraphs_and_adj_count:
-        count += 1
-        sum = paragraphs_and_adj_count[key]
+    # adjectives per paragraph closed by a blank line; the count of the last paragraph with
+    # adjectives is averaged over the sentences and paragraphs with adjectives
+    adj_in_paragraphs = [adj_count for adj_count in partial['adj_in_paragraphs'] if adj_count > 0]
+    if adj_in_paragraphs:
+        count += len(adj_in_paragraphs)
+        sum = adj_in_paragraphs[-1]
     avg_in_paragraphs = sum / count
 
     return {'adjectives': adjectives,
@@ -115,20 +235,17 @@ def total_adjectives(text_description):
             'average_adj_in_paragraphs': avg_in_paragraphs}
 
 
-def total_verbs(text_description):
+@requires('tagger')
+@summarizes(pos_words(VERB))
+def total_verbs(partial):
     """Verbs, total no of verbs, verb frequencies"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    doc = nlp(str(text_description).lower())
-
-    verbs = [token.text for token in doc if token.pos_ == 'VERB']
-    create_csv("total_no_of_verbs.csv", "Total_no_of_verbs", len(verbs))
-    create_csv_list("verb_list.csv", "Verb_list", verbs)
+    verbs = partial['words']
+    if not verbs:
+        return {'message': 'No verbs'}
 
     verb_frequency = Counter(verbs)
-    create_csv_dictionary("verb_frequency.csv", "Verbs", "Frequency", verb_frequency)
 
     favorite_verb = max(verb_frequency, key=verb_frequency.get)
-    create_csv("favorite_verb.csv", "Favorite_verbs", favorite_verb)
 
     return {'verbs': verbs,
             'verb_count': len(verbs),
@@ -136,21 +253,21 @@ def total_verbs(text_description):
             'favorite_verb': favorite_verb}
 
 
-def noun_noun_phrase(text_description):
-    """Noun-Noun phrases and their frequencies"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    doc = nlp(str(text_description).lower())
+def noun_chunk_texts(doc):
+    return {'phrases': [chunk.text for chunk in doc.noun_chunks]}
+
 
-    noun_noun_phrases = [chunk.text for chunk in doc.noun_chunks]
-    create_csv("total_noun_noun_phrase.csv", "Noun_noun_phrases", len(noun_noun_phrases))
-    create_csv_list("noun_noun_phrase_list.csv", "Noun_noun_phrase_list", noun_noun_phrases)
+@requires('tagger', 'parser')
+@summarizes(noun_chunk_texts)
+def noun_noun_phrase(partial):
+    """Noun-Noun phrases and their frequencies"""
+    noun_noun_phrases = partial['phrases']
+    if not noun_noun_phrases:
+        return {'message': 'No noun-noun phrases'}
 
     noun_noun_phrase_frequency = Counter(noun_noun_phrases)
-    create_csv_dictionary("noun_noun_phrase_frequency.csv", "Noun_Noun_phrase",
-                          "Frequency", noun_noun_phrase_frequency)
 
     favorite_noun_noun = max(noun_noun_phrase_frequency, key=noun_noun_phrase_frequency.get)
-    create_csv("favorite_noun_noun.csv", "Favorite_noun_noun_phrase", favorite_noun_noun)
 
     return {'noun_noun_phrases': noun_noun_phrases,
             'noun_noun_phrase_count': len(noun_noun_phrases),
@@ -158,56 +275,40 @@ def noun_noun_phrase(text_description):
             'favorite_noun_noun_phrase': favorite_noun_noun}
 
 
-def noun_adj_phrase(text_description):
+def matched_phrases(name):
+    def extract(doc):
+        return {'phrases': [doc[start:end].text for start, end in matches(doc)[name]]}
+    return extract
+
+
+@requires('tagger')
+@summarizes(matched_phrases('NOUN_ADJ_PATTERN'))
+def noun_adj_phrase(partial):
     """Gives Noun-adjective phrases from the text and their frequencies"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    matcher = Matcher(nlp.vocab)
-    doc = nlp(str(text_description).lower())
-    try:
-        pattern = [{'POS': 'NOUN'}, {'POS': 'ADJ'}]
-        matcher.add('NOUN_ADJ_PATTERN', None, pattern)
-        matches = matcher(doc)
-        print("Total matches found:", len(matches))
-
-        noun_adj_phrases = [doc[start:end].text for match_id, start, end in matches]
-        create_csv("total_noun_adj.csv", "Total_noun_adj", len(noun_adj_phrases))
-        create_csv_list("noun_adj_phrase_list.csv", "Noun_adj_phrase_list", noun_adj_phrases)
-
-        noun_adj_phrase_frequency = Counter(noun_adj_phrases)
-        create_csv_dictionary("noun_adj_frequency.csv", "Noun_adj_phrases", "Frequency",
-                              noun_adj_phrase_frequency)
-
-        favorite_noun_adj_phrase = max(noun_adj_phrase_frequency, key=noun_adj_phrase_frequency.get)
-        create_csv("favorite_noun_adj.csv", "Favorite_noun_adj_phrase", favorite_noun_adj_phrase)
-
-        return {'noun_adj_phrases': noun_adj_phrases,
-                'noun_adj_phrase_count': len(noun_adj_phrases),
-                'noun_adj_phrase_frequency': noun_adj_phrase_frequency,
-                'favorite_noun_adj_phrase': favorite_noun_adj_phrase}
-    except Exception:
-        pass
+    noun_adj_phrases = partial['phrases']
+    if not noun_adj_phrases:
+        return {'message': 'No noun-adjective phrases'}
 
+    noun_adj_phrase_frequency = Counter(noun_adj_phrases)
 
-def adj_noun_phrase(text_description):
-    """Gives adjective-noun phrases from the text and their frequencies"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    matcher = Matcher(nlp.vocab)
-    doc = nlp(str(text_description).lower())
+    favorite_noun_adj_phrase = max(noun_adj_phrase_frequency, key=noun_adj_phrase_frequency.get)
 
-    pattern = [{'POS': 'ADJ'}, {'POS': 'NOUN'}]
-    matcher.add('ADJ_NOUN_PATTERN', None, pattern)
-    matches = matcher(doc)
-    print("Total matches found", len(matches))
+    return {'noun_adj_phrases': noun_adj_phrases,
+            'noun_adj_phrase_count': len(noun_adj_phrases),
+            'noun_adj_phrase_frequency': noun_adj_phrase_frequency,
+            'favorite_noun_adj_phrase': favorite_noun_adj_phrase}
 
-    adj_noun_phrases = [doc[start:end].text for match_id, start, end in matches]
-    create_csv("total_adj_noun.csv", "Total_adj_noun", len(adj_noun_phrases))
-    create_csv_list("adj_noun_phrase_list.csv", "Adj_noun_phrase_list", adj_noun_phrases)
+
+@requires('tagger')
+@summarizes(matched_phrases('ADJ_NOUN_PATTERN'))
+def adj_noun_phrase(partial):
+    """Gives adjective-noun phrases from the text and their frequencies"""
+    adj_noun_phrases = partial['phrases']
+    if not adj_noun_phrases:
+        return {'message': 'No adjective-noun phrases'}
 
     adj_noun_phrase_frequency = Counter(adj_noun_phrases)
-    create_csv_dictionary("adj_noun_frequency.csv", "Adj_noun_phrases", "Frequency",
-                          adj_noun_phrase_frequency)
     favorite_adj_noun_phrase = max(adj_noun_phrase_frequency, key=adj_noun_phrase_frequency.get)
-    create_csv("favorite_adj_noun.csv", "Favorite_adj_noun_phrase", favorite_adj_noun_phrase)
 
     return {'adj_noun_phrases': adj_noun_phrases,
             'adj_noun_phrase_count': len(adj_noun_phrases),
@@ -215,119 +316,78 @@ def adj_noun_phrase(text_description):
             'favorite_adj_noun_phrase': favorite_adj_noun_phrase}
 
 
-def sentences_with_two_or_more_nouns(text_description):
-    """Sentences with two or more nouns"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    matcher = Matcher(nlp.vocab)
-    matched_sentences = []
+def matched_sentences(name):
+    """Text of the sentence around every match of the pattern, once per match"""
+    def extract(doc):
+        return {'sentences': [doc[start:end].sent.text for start, end in matches(doc)[name]]}
+    return extract
 
-    def collect_sents(matcher, doc_inside, i, matches):
-        match_id, start, end = matches[i]
-        span = doc_inside[start:end]
-        sents = span.sent
-        matched_sentences.append(sents.text)
 
-    pattern = [{'POS': 'NOUN'}, {'POS': 'NOUN'}, {'POS': 'NOUN', 'OP': '*'}]
-    matcher.add('SENTENCES_WITH_2_OR_MORE_NOUNS', collect_sents, pattern)
-    doc = nlp(str(text_description).lower())
-    match = matcher(doc)
-    return {'sentences_with_two_or_more_nouns': matched_sentences}
+@requires('tagger', 'parser')
+@summarizes(matched_sentences('SENTENCES_WITH_2_OR_MORE_NOUNS'))
+def sentences_with_two_or_more_nouns(partial):
+    """Sentences with two or more nouns"""
+    return {'sentences_with_two_or_more_nouns': partial['sentences']}
 
 
-def sentences_with_two_or_more_adj(text_description):
+@requires('tagger', 'parser')
+@summarizes(matched_sentences('SENTENCES_WITH_2_OR_MORE_ADJ'))
+def sentences_with_two_or_more_adj(partial):
     """Sentences with two or more adjectives"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    matcher = Matcher(nlp.vocab)
-    matched_sentences = []
+    return {'sentences_with_two_or_more_adj': partial['sentences']}
 
-    def collect_sents(matcher, doc, i, matches):
-        match_id, start, end = matches[i]
-        span = doc[start:end]
-        sents = span.sent
-        matched_sentences.append(sents.text)
 
-    pattern = [{'POS': 'ADJ'}, {'POS': 'ADJ'}, {'POS': 'ADJ', 'OP': '*'}]
-    matcher.add('SENTENCES_WITH_2_OR_MORE_ADJ', collect_sents, pattern)
-    doc = nlp(str(text_description).lower())
-    matches = matcher(doc)
-
-    return {'sentences_with_two_or_more_adj': matched_sentences}
-
-
-def sentences_with_two_or_more_verbs(text_description):
+@requires('tagger', 'parser')
+@summarizes(matched_sentences('SENTENCES_WITH_2_OR_MORE_VERB'))
+def sentences_with_two_or_more_verbs(partial):
     """Sentences with two or more verbs"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    matcher = Matcher(nlp.vocab)
-    doc = nlp(str(text_description).lower())
-    matches = matcher(doc)
-    matched_sentences = []
+    return {'sentences_with_two_or_more_verbs': partial['sentences']}
 
-    def collect_sents(matcher, doc, i, matches):
-        match_id, start, end = matches[i]
-        span = doc[start:end]
-        sents = span.sent
-        matched_sentences.append(sents.text)
 
-    pattern = [{'POS': 'VERB'}, {'POS': 'VERB'}, {'POS': 'VERB', 'OP': '*'}]
-    matcher.add('SENTENCES_WITH_2_OR_MORE_VERB', collect_sents, pattern)
+def sentences_with_pos(pos):
+    def extract(doc):
+        tokens = token_array(doc)
+        return {'sentences': tokens.sentence_texts(tokens.per_sentence(tokens.is_pos(pos)) > 0)}
+    return extract
 
-    return {'sentences_with_two_or_more_verbs': matched_sentences}
 
+def sentence_list(sentences):
+    """The sentences written out the way str() prints a list of sentence Spans"""
+    return '[' + ', '.join(sentences) + ']'
 
-def sentences_without_noun(text_description):
-    """Sentences without noun"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    doc = nlp(str(text_description).lower())
 
-    sentences = []
-    for sentence in list(doc.sents):
-        for token in sentence:
-            if token.pos_ == 'NOUN':
-                sentences.append(sentence)
-                break
-    return {'sentences_without_nouns': str(sentences)}
+@requires('tagger', 'parser')
+@summarizes(sentences_with_pos(NOUN))
+def sentences_without_noun(partial):
+    """Sentences without noun"""
+    return {'sentences_without_nouns': sentence_list(partial['sentences'])}
 
 
-def sentences_without_adj(text_description):
+@requires('tagger', 'parser')
+@summarizes(sentences_with_pos(ADJ))
+def sentences_without_adj(partial):
     """Sentences without adjectives"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    doc = nlp(str(text_description).lower())
-
-    sentences = []
-    for sentence in list(doc.sents):
-        for token in sentence:
-            if token.pos_ == 'ADJ':
-                sentences.append(sentence)
-                break
+    return {'sentences_without_adj': sentence_list(partial['sentences'])}
 
-    return {'sentences_without_adj': str(sentences)}
 
-
-def sentences_without_verbs(text_description):
+@requires('tagger', 'parser')
+@summarizes(sentences_with_pos(VERB))
+def sentences_without_verbs(partial):
     """Sentences without verbs"""
-    nlp.pipe(text_description, disable=['tokenizer', 'tagger', 'parser', 'ner', 'textcat', '...'])
-    doc = nlp(str(text_description).lower())
-    sentences = []
-    for sentence in list(doc.sents):
-        for token in sentence:
-            if token.pos_ == 'VERB':
-                sentences.append(sentence)
-                break
+    return {'sentences_without_verbs': sentence_list(partial['sentences'])}
 
-    return {'sentences_without_verbs': str(sentences)}
 
+def person_entities(doc):
+    return {'names': [ent.text for ent in doc.ents if ent.label_ == "PERSON"]}
 
-def person_names(text_description):
-    """Person names and their frequencies"""
-    nlp.pipe(text_description, disable=["tokenizer", "tagger", "parser", "ner", "textcat", "..."])
-    doc = nlp(str(text_description).lower())
 
-    names = [ent.text for ent in doc.ents if ent.label_ == "PERSON"]
-    create_csv("total_no_of_names.csv", "Total_no_of_person_names", len(names))
-    create_csv_list("name_list.csv", "Person_name_list", names)
+@requires('ner')
+@summarizes(person_entities)
+def person_names(partial):
+    """Person names and their frequencies"""
+    names = partial['names']
 
     name_frequency = Counter(names)
-    create_csv_dictionary("name_frequency.csv", "Person_name", "Frequency", name_frequency)
 
     try:
         # Person name with maximum frequency
@@ -340,42 +400,20 @@ def person_names(text_description):
         return {'message': 'No favorite person name'}
 
 
-def tense(text_description):
+def tense_sentences(doc):
+    tokens = token_array(doc)
+
+    # All sentences having verbs, then the tenses found among them
+    with_verbs = tokens.per_sentence(tokens.is_pos(VERB)) > 0
+    return {'present': tokens.sentence_texts(with_verbs & (tokens.per_sentence(tokens.has_tag(PRESENT_TAGS)) > 0)),
+            'past': tokens.sentence_texts(with_verbs & (tokens.per_sentence(tokens.has_tag(PAST_TAGS)) > 0)),
+            'future': tokens.sentence_texts(with_verbs & (tokens.per_sentence(tokens.has_tag(FUTURE_TAGS)) > 0))}
+
+
+@requires('tagger', 'parser')
+@summarizes(tense_sentences)
+def tense(partial):
     """Total present tense, past tense and future tense sentences"""
-    nlp.pipe(text_description, disable=["tokenizer", "tagger", "parser", "ner", "textcat", "..."])
-    doc = nlp(str(text_description).lower())
-
-    sents = doc.sents
-    sentences_with_verbs, present_tense_sentences, past_tense_sentences, future_tense_sentences = [], [], [], []
-
-    # All sentences having verbs
-    for sent in sents:
-        for token in sent:
-            if token.pos_ == "VERB":
-                sentences_with_verbs.append(sent)
-                break
-
-    # Present tense sentences
-    for sent in sentences_with_verbs:
-        for token in sent:
-            if token.tag_ in ["VBZ", "VBP", "VBG"]:
-                present_tense_sentences.append(sent)
-                break
-
-    # Past tense sentences
-    for sent in sentences_with_verbs:
-        for token in sent:
-            if token.tag_ in ["VBD", "VBN"]:
-                past_tense_sentences.append(sent)
-                break
-
-    # Future tense sentences
-    for sent in sentences_with_verbs:
-        for token in sent:
-            if token.tag_ in ["VBC", "VBF"]:
-                future_tense_sentences.append(sent)
-                break
-
-    return {'present_tense_sentences': str(present_tense_sentences),
-            'past_tense_sentences': str(past_tense_sentences),
-            'future_tense_sentences': str(future_tense_sentences)}
+    return {'present_tense_sentences': sentence_list(partial['present']),
+            'past_tense_sentences': sentence_list(partial['past']),
+            'future_tense_sentences': sentence_list(partial['future'])}
@@ -0,0 +1,77 @@
+import numpy as np
+from spacy.attrs import POS, TAG, SENT_START, IS_STOP, IS_PUNCT, IS_SPACE
+
+ATTRS = [POS, TAG, SENT_START, IS_STOP, IS_PUNCT, IS_SPACE]
+
+PRESENT_TAGS = ["VBZ", "VBP", "VBG"]
+PAST_TAGS = ["VBD", "VBN"]
+FUTURE_TAGS = ["VBC", "VBF"]
+
+
+class TokenArray:
+    """Token attributes of a Doc exported once with doc.to_array, so the analytics
+    work on NumPy columns instead of looping over the tokens in Python"""
+
+    def __init__(self, doc):
+        self.doc = doc
+        array = doc.to_array(ATTRS)
+        self.pos = array[:, 0]
+        self.tag = array[:, 1]
+        self.is_stop = array[:, 3].astype(bool)
+        self.is_punct = array[:, 4].astype(bool)
+        self.is_space = array[:, 5].astype(bool)
+
+        # Sentence boundaries; the first token always starts a sentence
+        sent_start = array[:, 2] == 1
+        if len(sent_start):
+            sent_start[0] = True
+        self.sent_starts = np.flatnonzero(sent_start)
+        self.sent_ends = np.append(self.sent_starts[1:], len(doc))
+        self.sent_id = np.cumsum(sent_start) - 1
+
+    def is_pos(self, pos):
+        return self.pos == pos
+
+    def has_tag(self, tags):
+        return np.isin(self.tag, [self.doc.vocab.strings.add(tag) for tag in tags])
+
+    def texts(self, mask):
+        doc = self.doc
+        return [doc[i].text for i in np.flatnonzero(mask)]
+
+    def per_sentence(self, mask):
+        """Number of tokens matching the mask in every sentence"""
+        return np.bincount(self.sent_id[mask], minlength=len(self.sent_starts))
+
+    def sentences(self, selected):
+        """Sentence spans for a boolean selection over the sentences"""
+        doc = self.doc
+        return [doc[start:end] for start, end in zip(self.sent_starts[selected], self.sent_ends[selected])]
+
+    def sentence_texts(self, selected):
+        return [span.text for span in self.sentences(selected)]
+
+    def paragraph_breaks(self):
+        """Indices of the whitespace tokens holding a blank line, which separate the paragraphs"""
+        doc = self.doc
+        return np.array([i for i in np.flatnonzero(self.is_space) if doc[i].text.count("\n") > 1], dtype=int)
+
+    def per_paragraph(self, mask):
+        """Number of tokens matching the mask in every paragraph closed by a blank line, and in the
+        open paragraph after the last blank line. A paragraph runs from the previous break
+        (inclusive) up to its own break."""
+        breaks = self.paragraph_breaks()
+        positions = np.flatnonzero(mask)
+        if not len(breaks):
+            return np.zeros(0, dtype=int), len(positions)
+        closed = positions[positions < breaks[-1]]
+        in_paragraphs = np.bincount(np.searchsorted(breaks, closed, side='right'), minlength=len(breaks))
+        return in_paragraphs, len(positions) - len(closed)
+
+
+def token_array(doc):
+    """The TokenArray of a Doc, built once and kept on the Doc for the other analyses"""
+    array = doc.user_data.get('token_array')
+    if array is None:
+        array = doc.user_data['token_array'] = TokenArray(doc)
+    return array
@@ -0,0 +1,70 @@
+from flask_restful import Resource, reqparse
+from models.frequency import TermFrequency, TextTerm
+from nlp.analysis import TERM_CATEGORIES
+from resources.spacy_resources import decode_cursor, encode_cursor, MAX_PAGE_SIZE, PAGE_SIZE
+
+
+def text_id_of(value):
+    """A text_id from a cursor as it was stored, a number or any string"""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise TypeError(value)
+    return value
+
+
+class TopTerms(Resource):
+    parser = reqparse.RequestParser()
+    parser.add_argument('k', type=int, default=10, location='args')
+
+    def get(self, category):
+        if category not in TERM_CATEGORIES:
+            return {'message': 'Unknown category {}, use one of {}'.format(category, ', '.join(TERM_CATEGORIES))}, 404
+
+        k = TopTerms.parser.parse_args()['k']
+        if k < 1:
+            return {'message': 'k must be at least 1'}, 400
+        return {'category': category, 'top': [row.json() for row in TermFrequency.top(category, k)]}
+
+
+class FavoriteTerm(Resource):
+    def get(self, category):
+        if category not in TERM_CATEGORIES:
+            return {'message': 'Unknown category {}, use one of {}'.format(category, ', '.join(TERM_CATEGORIES))}, 404
+
+        top = TermFrequency.top(category, 1)
+        if not top:
+            return {'message': 'No {} in the corpus yet'.format(category)}, 404
+        return {'category': category, 'favorite': top[0].json()}
+
+
+class TermTexts(Resource):
+    parser = reqparse.RequestParser()
+    parser.add_argument('term', action='append', required=True, location='args',
+                        help='Give at least one term, as category:term or just term')
+    parser.add_argument('mode', choices=('and', 'or'), default='or', location='args')
+    parser.add_argument('limit', type=int, default=PAGE_SIZE, location='args')
+    parser.add_argument('cursor', location='args')
+
+    def get(self):
+        request_data = TermTexts.parser.parse_args()
+        limit = request_data['limit']
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return {'message': 'limit must be between 1 and {}'.format(MAX_PAGE_SIZE)}, 400
+        try:
+            after_id = decode_cursor(request_data['cursor'], convert=text_id_of, first=None)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+
+        terms = []
+        for value in request_data['term']:
+            category, separator, term = value.partition(':')
+            if not separator:  # a bare term matches it in every category
+                category, term = list(TERM_CATEGORIES), value
+            elif category not in TERM_CATEGORIES:
+                return {'message': 'Unknown category {}, use one of {}'.format(category,
+                                                                                ', '.join(TERM_CATEGORIES))}, 404
+            terms.append((category, term.strip().lower()))  # terms are counted on the lowercased text
+
+        texts = TextTerm.postings(terms, request_data['mode'] == 'and', after_id, limit)
+        next_cursor = encode_cursor(texts[-1]['text_id']) if len(texts) == limit else None
+        return {'terms': request_data['term'], 'mode': request_data['mode'], 'texts': texts,
+                'next_cursor': next_cursor}
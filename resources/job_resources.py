@@ -0,0 +1,30 @@
+from flask_restful import Resource, reqparse
+from models.jobs import JobModel
+from models.spacy_models import DataModel
+from utils import job_queue
+
+
+class JobSubmit(Resource):
+    parser = reqparse.RequestParser()
+    parser.add_argument('text_id', type=int, required=True, help='This field cannot be empty')
+
+    def post(self):
+        text_id = JobSubmit.parser.parse_args()['text_id']
+        text = DataModel.find_by_text_id(text_id)
+        if text is None:
+            return {'message': 'The text with text_id {} does not exist'.format(text_id)}, 404
+
+        try:
+            job = job_queue.submit(text)
+        except job_queue.QueueFull:
+            return {'message': 'Too many analysis jobs are waiting, try again later'}, 503, {'Retry-After': '30'}
+
+        return job.json(), 202, {'Location': '/jobs/{}'.format(job.id)}
+
+
+class Job(Resource):
+    def get(self, job_id):
+        job = JobModel.find_by_id(job_id)
+        if job is None:
+            return {'message': 'The job {} does not exist'.format(job_id)}, 404
+        return job.json()
@@ -0,0 +1,32 @@
+from flask_restful import Resource, reqparse
+from sqlalchemy.exc import OperationalError
+
+from db import db
+from models.search import FIELDS, TextSearch
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class Search(Resource):
+    parser = reqparse.RequestParser()
+    parser.add_argument('q', required=True, location='args', help='The search query cannot be empty')
+    parser.add_argument('field', choices=FIELDS, location='args')
+    parser.add_argument('page', type=int, default=1, location='args')
+    parser.add_argument('limit', type=int, default=PAGE_SIZE, location='args')
+
+    def get(self):
+        request_data = Search.parser.parse_args()
+        page, limit = request_data['page'], request_data['limit']
+        if page < 1 or not 1 <= limit <= MAX_PAGE_SIZE:
+            return {'message': 'page must be at least 1 and limit between 1 and {}'.format(MAX_PAGE_SIZE)}, 400
+
+        try:
+            # One row more than the page tells whether there is a next page
+            hits = TextSearch.search(request_data['q'], request_data['field'], limit + 1, (page - 1) * limit)
+        except OperationalError as e:
+            db.session.rollback()
+            return {'message': 'Invalid search query: {}'.format(e.orig)}, 400
+
+        return {'query': request_data['q'], 'page': page, 'results': hits[:limit],
+                'next_page': page + 1 if len(hits) > limit else None}
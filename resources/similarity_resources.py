@@ -0,0 +1,25 @@
+from flask_restful import Resource, reqparse
+from models.similarity import TextSignature
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class Duplicates(Resource):
+    parser = reqparse.RequestParser()
+    parser.add_argument('threshold', type=float, default=0.8, location='args')
+    parser.add_argument('page', type=int, default=1, location='args')
+    parser.add_argument('limit', type=int, default=PAGE_SIZE, location='args')
+
+    def get(self):
+        request_data = Duplicates.parser.parse_args()
+        threshold, page, limit = request_data['threshold'], request_data['page'], request_data['limit']
+        if not 0 < threshold <= 1:
+            return {'message': 'threshold must be above 0 and at most 1'}, 400
+        if page < 1 or not 1 <= limit <= MAX_PAGE_SIZE:
+            return {'message': 'page must be at least 1 and limit between 1 and {}'.format(MAX_PAGE_SIZE)}, 400
+
+        clusters = TextSignature.clusters(threshold)
+        start = (page - 1) * limit
+        return {'threshold': threshold, 'page': page, 'clusters': clusters[start:start + limit],
+                'next_page': page + 1 if len(clusters) > start + limit else None}
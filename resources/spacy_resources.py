@@ -1,7 +1,85 @@
+import base64
+import binascii
+import json
+import os
+from collections import OrderedDict
+
+from flask import Response, request, stream_with_context
 from flask_restful import Resource, reqparse
+from db import chunked, db
 from models.spacy_models import DataModel
+from models.frequency import TermFrequency
+from models.paragraphs import ParagraphPartial
 from models.results import Results
-from nlp import operations
+from models.search import TextSearch
+from models.similarity import TextSignature
+from nlp import analysis, csv_export, minhash
+from utils import analysis_pool
+from utils.csv_writer import results_directory
+
+
+CACHE_MAX_AGE = int(os.environ.get('CACHE_MAX_AGE', '0'))  # seconds a proxy may serve a response unchecked
+# With REUSE_EXACT_MATCHES=1 a text whose exact content was analysed before (under any text_id)
+# gets those stored results instead of being parsed again
+REUSE_EXACT_MATCHES = os.environ.get('REUSE_EXACT_MATCHES') == '1'
+# POST /data/batch may not ask nlp.pipe for huge batches. It always parses in the request's process:
+# nlp.pipe(n_process=...) forks, and forking a threaded server is unsafe (see utils/analysis_pool.py),
+# so several processes are only for the Python API and ingest.py
+BATCH_MAX_BATCH_SIZE = int(os.environ.get('BATCH_MAX_BATCH_SIZE', '1000'))
+
+
+def store_results(text_id, text_description, results):
+    """Keep the analysis results of a stored text and update the corpus indexes built from them,
+    in the caller's transaction"""
+    Results.save_all(text_id, analysis.content_hash(text_description), results, commit=False)
+    TermFrequency.update_text(text_id, analysis.term_counts(results), commit=False)
+    if 'word_without_stopwords' in results:
+        words = results['word_without_stopwords'].get('text_without_stopwords', [])
+        TextSearch.set_words(text_id, words, commit=False)
+        signature = minhash.signature(words)
+        if signature is None:
+            TextSignature.delete_by_text_id(text_id, commit=False)
+        else:
+            TextSignature.save(text_id, signature, commit=False)
+
+
+def analyse_text(text_id, text_description, analyses=None):
+    """Analyse a stored text, keep its results and term counts, and build the response of GET /data.
+    Only the given analyses (all of them by default) and the pipeline components they need are run.
+    Results stored for the text's current content are served as they are; otherwise the text is
+    analysed paragraph by paragraph, parsing only the paragraphs it had no partials for (after an
+    edit, the changed ones), and the corpus indexes move by the difference in store_results."""
+    analyses = list(analysis.ANALYSES) if analyses is None else analyses
+    stored = Results.find_by_text_id(text_id, analysis.content_hash(text_description))
+    if all(name in stored for name in analyses):
+        return analysis.to_response(OrderedDict((name, stored[name]) for name in analyses))
+
+    results, save = compute_results(text_id, text_description, analyses)
+    save()
+    db.session.commit()
+    csv_export.export(results, results_directory(text_id))  # written after the response, per text
+
+    return analysis.to_response(results)
+
+
+def compute_results(text_id, text_description, analyses=None):
+    """Analyse a text without writing anything, so no write lock is held while the model runs.
+    Returns the results and a function that stores them, with the paragraph partials they were
+    merged from, in the caller's transaction."""
+    analyses = list(analysis.ANALYSES) if analyses is None else analyses
+    partials = cached = None
+    results = Results.find_by_text_hash(analysis.content_hash(text_description), analyses) \
+        if REUSE_EXACT_MATCHES else None
+    if results is None:
+        # in a worker process if ANALYSIS_PROCESSES is set
+        cached = ParagraphPartial.find_by_text_id(text_id)
+        results, partials = analysis_pool.analyse_paragraphs(text_description, analyses, cached)
+
+    def save():
+        if partials is not None:
+            ParagraphPartial.replace_text(text_id, partials, cached, commit=False)
+        store_results(text_id, text_description, results)
+    return results, save
 
 
 # Resource class also called Model class
@@ -11,87 +89,31 @@ class Data(Resource):
     # The parser searches for the arguments described in it and make changes to them and ignores the other args
 
     def get(self, text_id):
+        try:
+            analyses = analysis.select(request.args.get('analyses'))  # e.g. ?analyses=nouns,verbs,person_names
+        except ValueError as e:
+            return {'message': str(e)}, 400
+
         text = DataModel.find_by_text_id(text_id)
         if text:
             obj = DataModel(text_id, text.text_description)  # class object instance
             text_desc = obj.text_description
             # passing text_description(attribute of obj) to text_desc and to operations.py
 
-            result = operations.words_without_stopwords(text_desc)
-            obj_result = Results(result)
-            obj_result.save_to_db()
-
-            nouns = operations.total_nouns(text_desc)
-            obj_noun = Results(nouns)
-            obj_noun.save_to_db()
-
-            adjectives = operations.total_adjectives(text_desc)
-            obj_adjectives = Results(adjectives)
-            obj_adjectives.save_to_db()
-
-            verbs = operations.total_verbs(text_desc)
-            obj_verbs = Results(verbs)
-            obj_verbs.save_to_db()
-
-            noun_noun_phrases = operations.noun_noun_phrase(text_desc)
-            obj_noun_noun = Results(noun_noun_phrases)
-            obj_noun_noun.save_to_db()
-
-            noun_adj_phrases = operations.noun_adj_phrase(text_desc)
-            obj_noun_adj = Results(noun_adj_phrases)
-            obj_noun_adj.save_to_db()
-
-            adj_noun_phrases = operations.adj_noun_phrase(text_desc)
-            obj_adj_noun = Results(adj_noun_phrases)
-            obj_adj_noun.save_to_db()
-
-            sentences_with_two_or_more_nouns = operations.sentences_with_two_or_more_nouns(text_desc)
-            obj_sentences_noun = Results(sentences_with_two_or_more_nouns)
-            obj_sentences_noun.save_to_db()
-
-            sentences_with_two_or_more_adj = operations.sentences_with_two_or_more_adj(text_desc)
-            obj_sentences_adj = Results(sentences_with_two_or_more_adj)
-            obj_sentences_adj.save_to_db()
-
-            sentences_with_two_or_more_verbs = operations.sentences_with_two_or_more_verbs(text_desc)
-            obj_sentences_verbs = Results(sentences_with_two_or_more_verbs)
-            obj_sentences_verbs.save_to_db()
-
-            sentences_without_nouns = operations.sentences_without_noun(text_desc)
-            obj_sentences_without_noun = Results(sentences_without_nouns)
-            obj_sentences_without_noun.save_to_db()
-
-            sentences_without_adjectives = operations.sentences_without_adj(text_desc)
-            obj_sentences_without_adjectives = Results(sentences_without_adjectives)
-            obj_sentences_without_adjectives.save_to_db()
-
-            sentences_without_verbs = operations.sentences_without_verbs(text_desc)
-            obj_sentences_without_verbs = Results(sentences_without_verbs)
-            obj_sentences_without_verbs.save_to_db()
-
-            person_names = operations.person_names(text_desc)
-            obj.names = Results(person_names)
-            obj.names.save_to_db()
-
-            tenses = operations.tense(text_desc)
-            obj_tense = Results(tenses)
-            obj_tense.save_to_db()
-
-            return {'word_without_stopwords': result,
-                    'nouns': nouns,
-                    'adjectives': adjectives,
-                    'verbs': verbs,
-                    'noun_noun_phrases': noun_noun_phrases,
-                    'noun_adj_phrases': noun_adj_phrases,
-                    'adj_noun_phrases': adj_noun_phrases,
-                    'sentences_with_one_or_more_nouns': str(sentences_with_two_or_more_nouns),
-                    'sentences_with_one_or_more_adj': str(sentences_with_two_or_more_adj),
-                    'sentences_with_one_or_more_verbs': str(sentences_with_two_or_more_verbs),
-                    'sentences_without_nouns': str(sentences_without_nouns),
-                    'sentences_without_adjectives': str(sentences_without_adjectives),
-                    'sentences_without_verbs': str(sentences_without_verbs),
-                    'person_names': person_names,
-                    'sentences_with_different_tenses': tenses}
+            # The response only depends on the text and the analyses, so a client (or proxy) holding the
+            # current ETag gets a 304 without any NLP work
+            etag = analysis.etag(text_desc, analyses)
+            headers = {'ETag': '"{}"'.format(etag),
+                       'Cache-Control': 'public, max-age={}, must-revalidate'.format(CACHE_MAX_AGE)}
+            if request.if_none_match.contains(etag):
+                return Response(status=304, headers=headers)
+
+            try:
+                return analyse_text(text.text_id, text_desc, analyses), 200, headers
+            except analysis_pool.PoolFull:
+                return {'message': 'Too many analyses are running, try again later'}, 503, {'Retry-After': '1'}
+            except analysis_pool.AnalysisTimeout:
+                return {'message': 'The analysis took too long'}, 504
 
         return {"message": "Something is wrong"}
 
@@ -111,25 +133,165 @@ class Data(Resource):
     def delete(self, text_id):
         text = DataModel.find_by_text_id(text_id)
         if text:
-            text.delete_from_db()
+            # The text and everything derived from it go in one transaction
+            try:
+                Results.delete_by_text_id(text.text_id, commit=False)
+                TermFrequency.remove_text(text.text_id, commit=False)
+                TextSignature.delete_by_text_id(text.text_id, commit=False)
+                ParagraphPartial.delete_by_text_id(text.text_id, commit=False)
+                text.delete_from_db(commit=False)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                return {'message': 'An error occurred while deleting the item'}, 500
 
         return {'message': 'text with text_id {} deleted'.format(text_id)}
 
     def put(self, text_id):
         request_data = Data.parser.parse_args()  # Execution
 
-        text = next(filter(lambda x: x['text_id'] == text_id, text_list), None)
+        text = DataModel.find_by_text_id(text_id)
         if text is None:
-            text = {
-                'text_id': text_id,
-                'text_description': request_data['text description']
-            }
-            text_list.append(text)
+            text = DataModel(text_id, request_data['text_description'])
+            try:
+                text.save_to_db()
+            except Exception:
+                return {'message': 'An error occurred while updating the item'}, 500
+            return text.json()
+
+        try:
+            # The new text is analysed before anything is written (only its edited paragraphs are parsed),
+            # then the text and its analysis are committed together in one short transaction: the results,
+            # term counts and indexes never describe a text other than the stored one
+            results, save = compute_results(text.text_id, request_data['text_description'])
+            text.text_description = request_data['text_description']
+            db.session.add(text)
+            save()
+            db.session.commit()
+        except analysis_pool.PoolFull:
+            db.session.rollback()
+            return {'message': 'Too many analyses are running, try again later'}, 503, {'Retry-After': '1'}
+        except analysis_pool.AnalysisTimeout:
+            db.session.rollback()
+            return {'message': 'The analysis took too long'}, 504
+        except Exception:
+            db.session.rollback()
+            return {'message': 'An error occurred while updating the item'}, 500
+        csv_export.export(results, results_directory(text.text_id))
+        return text.json()
+
+
+class DataBatch(Resource):
+    parser = reqparse.RequestParser()
+    parser.add_argument('text_ids', type=int, action='append', location='json')
+    parser.add_argument('texts', action='append', location='json')
+    parser.add_argument('batch_size', type=int, default=analysis.BATCH_SIZE, location='json')
+    parser.add_argument('analyses', location='json')
+
+    def post(self):
+        request_data = DataBatch.parser.parse_args()
+        if not 1 <= request_data['batch_size'] <= BATCH_MAX_BATCH_SIZE:
+            return {'message': 'batch_size must be between 1 and {}'.format(BATCH_MAX_BATCH_SIZE)}, 400
+        try:
+            analyses = analysis.select(request_data['analyses'])
+        except ValueError as e:
+            return {'message': str(e)}, 400
+
+        missing = []
+        if request_data['text_ids']:
+            found = {}
+            for chunk in chunked(request_data['text_ids']):
+                rows = DataModel.query.filter(DataModel.text_id.in_(chunk))
+                found.update((row.text_id, row.text_description) for row in rows)
+            missing = [text_id for text_id in request_data['text_ids'] if text_id not in found]
+            keys = [('text_id', text_id) for text_id in request_data['text_ids'] if text_id in found]
+            texts = [found[text_id] for key, text_id in keys]
+        elif request_data['texts']:
+            keys = [('index', i) for i in range(len(request_data['texts']))]
+            texts = request_data['texts']
         else:
-            text.update(request_data)
-        return text
+            return {'message': 'Either text_ids or texts must be given'}, 400
+
+        def generate():
+            # One JSON line per text, sent as soon as that text has been analysed
+            for text_id in missing:
+                yield json.dumps({'text_id': text_id,
+                                  'message': 'The text with text_id {} does not exist'.format(text_id)}) + '\n'
+            batch = analysis.analyse_batch(texts, analyses, batch_size=request_data['batch_size'])
+            done = 0
+            try:
+                for (key, value), text_description, results in zip(keys, texts, batch):
+                    done += 1
+                    if key == 'text_id' and not isinstance(results, Exception):
+                        # raw texts have no text_id to store their results under
+                        try:
+                            store_results(value, text_description, results)
+                            db.session.commit()
+                        except Exception as e:
+                            db.session.rollback()
+                            results = e
+                        else:
+                            csv_export.export(results, results_directory(value))
+                    if isinstance(results, Exception):  # one failing text does not end the stream
+                        yield json.dumps({key: value, 'message': 'Analysis failed: {}'.format(results)}) + '\n'
+                    else:
+                        yield json.dumps({key: value, 'results': analysis.to_response(results)}) + '\n'
+            except Exception as e:  # nlp.pipe itself failed, none of the remaining texts was parsed
+                db.session.rollback()
+                for key, value in keys[done:]:
+                    yield json.dumps({key: value, 'message': 'Analysis failed: {}'.format(e)}) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(last_id):
+    """An opaque token for the page after the row with this id"""
+    return base64.urlsafe_b64encode(json.dumps({'id': last_id}).encode()).decode()
+
+
+def decode_cursor(cursor, convert=int, first=0):
+    """The id a page starts after, passed through convert; first when there is no cursor"""
+    if not cursor:
+        return first
+    try:
+        return convert(json.loads(base64.urlsafe_b64decode(cursor.encode()))['id'])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor')
 
 
 class AllData(Resource):
+    parser = reqparse.RequestParser()
+    parser.add_argument('limit', type=int, default=PAGE_SIZE, location='args')
+    parser.add_argument('cursor', location='args')
+    parser.add_argument('format', choices=('json', 'ndjson'), default='json', location='args')
+
     def get(self):
-        return {'text list': text_list}
+        request_data = AllData.parser.parse_args()
+        limit = request_data['limit']
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return {'message': 'limit must be between 1 and {}'.format(MAX_PAGE_SIZE)}, 400
+        try:
+            after_id = decode_cursor(request_data['cursor'])
+        except ValueError as e:
+            return {'message': str(e)}, 400
+
+        if request_data['format'] == 'ndjson':
+            def generate(after_id=after_id):
+                # The whole table, one json line per text, read page by page so memory stays flat
+                while True:
+                    texts = DataModel.page(after_id, limit)
+                    for text in texts:
+                        yield json.dumps(text.json()) + '\n'
+                    if len(texts) < limit:
+                        return
+                    after_id = texts[-1].id
+
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        texts = DataModel.page(after_id, limit)
+        next_cursor = encode_cursor(texts[-1].id) if len(texts) == limit else None
+        return {'text list': [text.json() for text in texts], 'next_cursor': next_cursor}
@@ -0,0 +1,154 @@
+"""Worker processes for the analyses of synchronous requests.
+
+spaCy and the operations hold the GIL, so the request threads of one process share a single core.
+With ANALYSIS_PROCESSES=N the analyses of GET /data run in a pool of N processes instead, each of
+which loads and warms up the model once. At most ANALYSIS_MAX_PENDING analyses are accepted at a
+time (running or waiting); beyond that a request is turned away right away instead of queueing up,
+and a request gives up waiting after ANALYSIS_TIMEOUT seconds. An analysis keeps its slot until its
+worker is done; one that times out has the pool terminated and replaced, since its worker is stuck
+or was killed and would otherwise hold the slot for good. A worker process is replaced after
+ANALYSIS_MAX_TASKS_PER_CHILD analyses (0 = never), which also returns the memory it has grown.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+
+from nlp import analysis, model
+from utils import metrics
+
+PROCESSES = int(os.environ.get('ANALYSIS_PROCESSES', '0'))  # 0 analyses in the request thread as before
+MAX_PENDING = int(os.environ.get('ANALYSIS_MAX_PENDING', str(2 * PROCESSES)))
+TIMEOUT = float(os.environ.get('ANALYSIS_TIMEOUT', '30'))
+MAX_TASKS_PER_CHILD = int(os.environ.get('ANALYSIS_MAX_TASKS_PER_CHILD', '1000'))
+START_METHOD = os.environ.get('ANALYSIS_START_METHOD', 'spawn')  # forking a threaded server is unsafe
+
+
+class PoolFull(Exception):
+    pass
+
+
+class AnalysisTimeout(Exception):
+    pass
+
+
+def _analyse_paragraphs(text_description, analyses, cached):
+    try:
+        return analysis.analyse_paragraphs(text_description, analyses, cached)
+    finally:
+        model.check_memory(background=False)  # a worker process has no other requests to serve meanwhile
+
+
+class _Task:
+    """One submitted analysis; done is set once its result or error is in, or its pool is gone"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.done = threading.Event()
+        self.value = self.error = None
+
+
+class AnalysisPool:
+    """A multiprocessing pool behind a bounded number of submission slots"""
+
+    def __init__(self, processes=PROCESSES, max_pending=MAX_PENDING, timeout=TIMEOUT,
+                 max_tasks_per_child=MAX_TASKS_PER_CHILD):
+        self.processes = processes
+        self.max_pending = max(max_pending, processes)
+        self.timeout = timeout
+        self.max_tasks_per_child = max_tasks_per_child or None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._tasks = set()  # submitted and not finished, each holding a slot
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def run(self, function, *args):
+        """Run function(*args) in a worker process. Raises PoolFull when every slot is taken (or the
+        pool was restarted under the analysis) and AnalysisTimeout when the result does not come
+        within the timeout."""
+        if not self._slots.acquire(blocking=False):
+            metrics.inc('spacyapi_analysis_pool_rejected_total')
+            raise PoolFull()
+        try:
+            pool = self._get_pool()
+        except Exception:
+            self._slots.release()
+            raise
+        task = _Task(pool)
+        with self._lock:
+            self._tasks.add(task)
+        try:
+            # The slot is given back when the worker is done, not when the caller stops waiting, so
+            # an analysis that is still running counts against the limit
+            pool.apply_async(function, args, callback=lambda value: self._finish(task, value=value),
+                             error_callback=lambda error: self._finish(task, error=error))
+        except Exception as e:
+            self._finish(task, error=e)
+            raise
+        if not task.done.wait(self.timeout):
+            self._restart(pool)
+            raise AnalysisTimeout()
+        if task.error is not None:
+            raise task.error
+        return task.value
+
+    def pending(self):
+        return {(): len(self._tasks)}
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            self._terminate(pool)
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                context = multiprocessing.get_context(START_METHOD)
+                self._pool = context.Pool(self.processes, initializer=model.warm_up,
+                                          maxtasksperchild=self.max_tasks_per_child)
+            return self._pool
+
+    def _restart(self, pool):
+        """Replace the pool of an analysis that timed out. Its worker is stuck, or was killed and will
+        never report back, and terminating the pool is the only way to get that process and slot back.
+        The other analyses of the old pool end with PoolFull; new ones go to a fresh pool."""
+        with self._lock:
+            if self._pool is not pool:  # restarted already by another analysis that timed out
+                return
+            self._pool = None
+        metrics.inc('spacyapi_analysis_pool_restarts_total')
+        self._terminate(pool)
+
+    def _terminate(self, pool):
+        pool.terminate()
+        with self._lock:
+            aborted = [task for task in self._tasks if task.pool is pool]
+        for task in aborted:
+            self._finish(task, error=PoolFull())
+
+    def _finish(self, task, value=None, error=None):
+        """Give the slot of a task back; only the first of its result and the end of its pool counts"""
+        with self._lock:
+            if task not in self._tasks:
+                return
+            self._tasks.remove(task)
+        task.value, task.error = value, error
+        self._slots.release()
+        task.done.set()
+
+
+analysis_pool = AnalysisPool() if PROCESSES > 0 else None
+if analysis_pool is not None:
+    atexit.register(analysis_pool.close)
+    metrics.register_gauge('spacyapi_analysis_pool_pending', analysis_pool.pending,
+                           'Analyses running or waiting in the worker processes')
+    metrics.HELP['spacyapi_analysis_pool_rejected_total'] = 'Analyses turned away because the pool was full'
+    metrics.HELP['spacyapi_analysis_pool_restarts_total'] = 'Pools replaced after an analysis timed out'
+
+
+def analyse_paragraphs(text_description, analyses=None, cached=None):
+    """analysis.analyse_paragraphs, in a worker process when the pool is enabled"""
+    if analysis_pool is None:
+        return analysis.analyse_paragraphs(text_description, analyses, cached)
+    return analysis_pool.run(_analyse_paragraphs, text_description, analyses, cached)
@@ -1,31 +1,91 @@
 import csv
+import os
+import queue
+import tempfile
+import threading
 
+from utils import metrics
 
-def create_csv(filename, string, l):
-    with open("Results/" + filename, "w") as csv_file:
-        writer = csv.writer(csv_file, delimiter=",")
+RESULTS_DIR = "Results"
+QUEUE_SIZE = 1000  # pending writes before submitters have to wait for the writer thread
 
-        writer.writerow([string])
-        writer.writerow([l])
 
+def _atomic_writer(filename, directory):
+    """Open a temp file next to the target; it replaces the target only once it is fully written"""
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".csv")
+    return os.fdopen(fd, "w", newline=""), tmp_path, os.path.join(directory, filename)
 
-def create_csv_list(filename, string, l):
-    with open("Results/" + filename, "w") as csv_file:
-        writer = csv.writer(csv_file, delimiter=",")
 
-        writer.writerow([string])
-        for element in sorted(l):
-            writer.writerow([element])
+def _write_rows(filename, directory, rows):
+    with metrics.timed("spacyapi_csv_write_seconds"):
+        _write_rows_atomically(filename, directory, rows)
 
 
-def create_csv_dictionary(filename, string1, string2, d):
+def _write_rows_atomically(filename, directory, rows):
+    csv_file, tmp_path, path = _atomic_writer(filename, directory)
+    try:
+        with csv_file:
+            writer = csv.writer(csv_file, delimiter=",")
+            writer.writerows(rows)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def create_csv(filename, string, l, directory=RESULTS_DIR):
+    _write_rows(filename, directory, [[string], [l]])
+
+
+def create_csv_list(filename, string, l, directory=RESULTS_DIR):
+    _write_rows(filename, directory, [[string]] + [[element] for element in sorted(l)])
+
+
+def create_csv_dictionary(filename, string1, string2, d, directory=RESULTS_DIR):
     """Create csv files and arrange the contents in dictionary format"""
-    with open("Results/" + filename, "w") as csv_file:
-        writer = csv.writer(csv_file, delimiter=",")
+    rows = [[string1, string2]]
+    for i, (key, value) in enumerate(sorted(d.items()), start=1):
+        rows.append([i, key, value])
+    _write_rows(filename, directory, rows)
+
+
+class BackgroundWriter:
+    """Runs csv writes on a daemon thread fed by a queue so requests never wait for the disk"""
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args, **kwargs):
+        self._start()
+        self._queue.put((function, args, kwargs))
+
+    def flush(self):
+        """Block until every submitted write has finished"""
+        self._queue.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="csv-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            function, args, kwargs = self._queue.get()
+            try:
+                function(*args, **kwargs)
+            except Exception as e:
+                print("csv export failed:", e)
+            finally:
+                self._queue.task_done()
+
+
+background_writer = BackgroundWriter()
 
-        writer.writerow([string1, string2])
-        i = 1
-        for key, value in sorted(d.items()):
-            writer.writerow([i, key, value])
-            i = i + 1
 
+def results_directory(text_id):
+    """Every text gets its own folder of csv files so concurrent requests never share a file"""
+    return os.path.join(RESULTS_DIR, str(text_id))
@@ -0,0 +1,112 @@
+import threading
+
+from db import db
+from models.jobs import JobModel
+from models.spacy_models import DataModel
+from nlp.analysis import text_hash
+from resources.spacy_resources import analyse_text
+from utils.analysis_pool import PoolFull
+
+WORKERS = 2  # worker threads taking jobs from the queue
+MAX_QUEUE_DEPTH = 1000  # pending jobs accepted before submissions are turned away
+MAX_ATTEMPTS = 3  # tries per job before it is marked failed
+RETRY_DELAY = 5  # seconds before a failed job is tried again, doubled after every further failure
+BUSY_DELAY = 2  # seconds a job waits when the analysis pool is full; this does not use up an attempt
+POLL_INTERVAL = 0.5  # seconds an idle worker waits before looking at the queue again
+HEARTBEAT_INTERVAL = 60  # seconds between two updates of the running jobs and looks for stale ones
+STALE_AFTER = 600  # seconds without a heartbeat after which a running job is assumed lost and queued again
+
+
+class QueueFull(Exception):
+    pass
+
+
+def submit(text):
+    """Queue the analysis of a stored text and return its job, sharing a pending job for the same text"""
+    content_hash = text_hash(text.text_description)
+    job = JobModel.find_active(text.text_id, content_hash)
+    if job is not None:
+        return job
+    if JobModel.queue_depth() >= MAX_QUEUE_DEPTH:
+        raise QueueFull()
+
+    job = JobModel(text.text_id, content_hash)
+    job.save_to_db()
+    return job
+
+
+def run_job(job):
+    text = DataModel.find_by_text_id(job.text_id)
+    if text is None:
+        job.fail('The text with text_id {} does not exist'.format(job.text_id), max_attempts=0)
+        return
+    try:
+        result = analyse_text(text.text_id, text.text_description)
+    except PoolFull:  # the server is busy, which says nothing about the job
+        db.session.rollback()
+        job.postpone(BUSY_DELAY)
+    except Exception as e:
+        db.session.rollback()
+        job.fail(repr(e), MAX_ATTEMPTS, RETRY_DELAY)
+    else:
+        job.finish(result)
+
+
+class JobWorkers:
+    """Daemon threads that take jobs from the SQLite queue inside an app context"""
+
+    def __init__(self, app, workers=WORKERS):
+        self.app = app
+        self.workers = workers
+        self._threads = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._running = set()  # ids of the jobs the threads of this process are running
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            threads = [threading.Thread(target=self._run, name='job-worker-{}'.format(i), daemon=True)
+                       for i in range(self.workers)]
+            threads.append(threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True))
+            for thread in threads:
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            job = None
+            with self.app.app_context():
+                try:
+                    job = JobModel.claim()
+                    if job is not None:
+                        with self._lock:
+                            self._running.add(job.id)
+                        try:
+                            run_job(job)
+                        finally:
+                            with self._lock:
+                                self._running.discard(job.id)
+                except Exception as e:
+                    print('job worker error:', e)
+            if job is None:
+                self._stop.wait(POLL_INTERVAL)
+
+    def _heartbeat(self):
+        """Keep the jobs running here from looking stale, however long their analysis takes, and requeue
+        the jobs lost by a worker of this or another process without waiting for a restart"""
+        while True:
+            with self.app.app_context():
+                try:
+                    with self._lock:
+                        running = set(self._running)
+                    JobModel.heartbeat(running)
+                    JobModel.requeue_stale(STALE_AFTER)
+                except Exception as e:
+                    print('job heartbeat error:', e)
+            if self._stop.wait(HEARTBEAT_INTERVAL):
+                return
@@ -0,0 +1,145 @@
+"""Latency histograms and counters for the hot paths, rendered in the Prometheus text format.
+
+Set METRICS=0 to turn the instrumentation off; timed() and inc() then return right away.
+With PROFILE_REQUESTS=1 a request with ?profile=1 (or a PROFILE_SAMPLE_RATE share of all
+requests) runs under cProfile and its stats are written to the profiles/ folder.
+"""
+import cProfile
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('METRICS', '1') != '0'
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS') == '1'
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = 'profiles'
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'spacyapi_request_seconds': 'Time spent handling HTTP requests',
+    'spacyapi_operation_seconds': 'Time spent in each step (extract, summarize) of the operations of nlp/operations.py',
+    'spacyapi_component_seconds': 'Time spent in each spaCy pipeline component',
+    'spacyapi_db_commit_seconds': 'Time spent committing to the database',
+    'spacyapi_csv_write_seconds': 'Time spent writing csv files',
+    'spacyapi_docs_total': 'Texts and paragraphs parsed by the spaCy pipeline',
+    'spacyapi_tokens_total': 'Tokens parsed by the spaCy pipeline',
+}
+
+_lock = threading.Lock()
+_histograms = defaultdict(lambda: [[0] * len(BUCKETS), 0, 0.0])  # (name, labels) -> [bucket counts, count, sum]
+_counters = defaultdict(float)  # (name, labels) -> value
+_gauges = {}  # name -> function returning {labels: value}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, seconds, **labels):
+    if not ENABLED:
+        return
+    with _lock:
+        histogram = _histograms[_key(name, labels)]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[0][i] += 1
+        histogram[1] += 1
+        histogram[2] += seconds
+
+
+def inc(name, value=1, **labels):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def register_gauge(name, function, help_text=''):
+    """A value read at scrape time; function returns {labels tuple: value}"""
+    _gauges[name] = function
+    if help_text:
+        HELP[name] = help_text
+
+
+@contextmanager
+def timed(name, **labels):
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def _labels(labels, extra=()):
+    labels = tuple(labels) + tuple(extra)
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for key, value in labels) + '}'
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        histograms = {key: ([*value[0]], value[1], value[2]) for key, value in _histograms.items()}
+        counters = dict(_counters)
+
+    lines, described = [], set()
+
+    def describe(name, kind):
+        if name not in described:
+            described.add(name)
+            lines.append('# HELP {} {}'.format(name, HELP.get(name, name)))
+            lines.append('# TYPE {} {}'.format(name, kind))
+
+    for (name, labels), (buckets, count, total) in sorted(histograms.items()):
+        describe(name, 'histogram')
+        for bound, bucket_count in zip(BUCKETS, buckets):
+            lines.append('{}_bucket{} {}'.format(name, _labels(labels, [('le', bound)]), bucket_count))
+        lines.append('{}_bucket{} {}'.format(name, _labels(labels, [('le', '+Inf')]), count))
+        lines.append('{}_sum{} {}'.format(name, _labels(labels), total))
+        lines.append('{}_count{} {}'.format(name, _labels(labels), count))
+    for (name, labels), value in sorted(counters.items()):
+        describe(name, 'counter')
+        lines.append('{}{} {}'.format(name, _labels(labels), value))
+    for name, function in sorted(_gauges.items()):
+        describe(name, 'gauge')
+        for labels, value in function().items():
+            lines.append('{}{} {}'.format(name, _labels(labels), value))
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Time every request and, when PROFILE_REQUESTS=1, profile the ones that ask for it or are sampled"""
+    from flask import g, request
+
+    @app.before_request
+    def start_request_timer():
+        if ENABLED:
+            g.metrics_started = time.perf_counter()
+        if PROFILE_REQUESTS and (request.args.get('profile') == '1' or random.random() < PROFILE_SAMPLE_RATE):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def stop_request_timer(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, '{}-{}.prof'.format(time.strftime('%Y%m%d-%H%M%S'),
+                                                                 request.endpoint or 'unknown'))
+            profiler.dump_stats(path)
+            response.headers['X-Profile'] = path
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            observe('spacyapi_request_seconds', time.perf_counter() - started,
+                    endpoint=request.endpoint or 'unknown', method=request.method, status=response.status_code)
+        return response